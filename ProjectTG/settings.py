@@ -86,9 +86,32 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'investudytgpassword'),
         'HOST': os.getenv('POSTGRES_HOST', 'db'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        # Соединение переиспользуется до DB_CONN_MAX_AGE секунд и проверяется перед использованием
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# Пул соединений psycopg 3 (требует установленного psycopg[pool]).
+# При включённом пуле соединения возвращаются в пул, поэтому CONN_MAX_AGE должен быть 0.
+if os.getenv('DB_POOL', 'False') == 'True':
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '4')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '600')),
+            # Проверка соединения при выдаче из пула, чтобы пережить перезапуск базы
+            'check': ConnectionPool.check_connection,
+        },
+    }
+
+# Как часто (в секундах) бот проверяет соединение с базой между ORM-вызовами
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_HEALTH_CHECK_INTERVAL', '30'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -133,6 +156,58 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Бот по умолчанию, пока в базе нет записей BotTenant
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 SUPPORT_CHAT_ID = os.getenv('SUPPORT_CHAT_ID')
 
+
+# Минимальный BM25-score, при котором бот предлагает ответ из FAQ до создания заявки
+FAQ_MATCH_MIN_SCORE = float(os.getenv('FAQ_MATCH_MIN_SCORE', '2.5'))
+
+# Как часто (в секундах) бот проверяет, не изменился ли каталог страниц в админке
+CATALOG_RELOAD_INTERVAL = int(os.getenv('CATALOG_RELOAD_INTERVAL', '30'))
+
+# Бюджет времени холодного импорта бота в миллисекундах для команды bench_startup
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1500'))
+
+# Параметры HTTP-клиента Bot API. HTTP/2 требует установленного python-telegram-bot[http2].
+TELEGRAM_HTTP = {
+    'connection_pool_size': int(os.getenv('TELEGRAM_CONNECTION_POOL_SIZE', '32')),
+    'connect_timeout': float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5')),
+    'read_timeout': float(os.getenv('TELEGRAM_READ_TIMEOUT', '5')),
+    'write_timeout': float(os.getenv('TELEGRAM_WRITE_TIMEOUT', '5')),
+    'pool_timeout': float(os.getenv('TELEGRAM_POOL_TIMEOUT', '1')),
+    'http_version': os.getenv('TELEGRAM_HTTP_VERSION', '1.1'),
+}
+# Для getUpdates достаточно одного соединения на бота: долгий опрос идёт последовательно.
+# Пул обоих клиентов общий для всех ботов из BotTenant (см. tg_app.bot_api.build_requests)
+TELEGRAM_GET_UPDATES_HTTP = dict(
+    TELEGRAM_HTTP,
+    connection_pool_size=int(os.getenv('TELEGRAM_GET_UPDATES_POOL_SIZE', '1')),
+)
+
+# Архивация закрытых заявок (команда archive_tickets). Без пакета zstandard архив сжимается gzip.
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_STATUSES = ('closed',)
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '200'))
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv('ARCHIVE_COMPRESSION_LEVEL', '3'))
+
+# Токен для выгрузки /api/export/ из BI-инструментов (заголовок "Authorization: Bearer <токен>")
+EXPORT_API_TOKEN = os.getenv('EXPORT_API_TOKEN')
+
+# Флуд-контроль: токенов в секунду и размер бакета на пользователя и на весь бот,
+# через сколько секунд простоя бакет пользователя удаляется из памяти
+FLOOD_GUARD = {
+    'user_rate': float(os.getenv('FLOOD_USER_RATE', '1')),
+    'user_burst': float(os.getenv('FLOOD_USER_BURST', '5')),
+    'global_rate': float(os.getenv('FLOOD_GLOBAL_RATE', '25')),
+    'global_burst': float(os.getenv('FLOOD_GLOBAL_BURST', '50')),
+    'idle_ttl': float(os.getenv('FLOOD_IDLE_TTL', '600')),
+}
+
+# Через сколько секунд бездействия незавершённый диалог сбрасывается (нужен python-telegram-bot[job-queue])
+CONVERSATION_TIMEOUT = int(os.getenv('CONVERSATION_TIMEOUT', '900'))
+# Лимиты памяти на данные незавершённых диалогов: на одного пользователя и на весь бот
+USER_DATA_MAX_BYTES = int(os.getenv('USER_DATA_MAX_BYTES', str(10 * 1024 * 1024)))
+USER_DATA_TOTAL_MAX_BYTES = int(os.getenv('USER_DATA_TOTAL_MAX_BYTES', str(256 * 1024 * 1024)))
@@ -1,18 +1,93 @@
+from datetime import timedelta
+
 from django.contrib import admin
-from .models import UserProfile, Ticket, Attachment
+from .export import export_response, ticket_rows, user_rows
+from .models import UserProfile, Ticket, Attachment, BotTenant, FaqArticle, Page, Section, TicketDailyStat
+from .views import EXPORT_PERMISSIONS
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('telegram_id', 'username', 'first_name', 'last_name')
+    actions = ('export_csv', 'export_jsonl')
+
+    def has_export_permission(self, request):
+        return request.user.has_perms(EXPORT_PERMISSIONS['users'])
+
+    @admin.action(description='Выгрузить в CSV', permissions=['export'])
+    def export_csv(self, request, queryset):
+        return export_response('csv', *user_rows(queryset), 'users')
+
+    @admin.action(description='Выгрузить в JSONL', permissions=['export'])
+    def export_jsonl(self, request, queryset):
+        return export_response('jsonl', *user_rows(queryset), 'users')
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
-    list_display = ('ticket_id', 'user', 'status', 'created_at')
+    list_display = ('ticket_id', 'user', 'tenant', 'status', 'created_at')
     search_fields = ('ticket_id', 'user__username')
-    list_filter = ('status',)
+    list_filter = ('status', 'tenant')
+    actions = ('export_csv', 'export_jsonl')
+
+    def has_export_permission(self, request):
+        # Строки выгрузки содержат данные пользователей, поэтому права те же, что у /api/export/tickets/
+        return request.user.has_perms(EXPORT_PERMISSIONS['tickets'])
+
+    # Вложения в выгрузку из админки не попадают, для них есть /api/export/tickets/?attachments=1
+    @admin.action(description='Выгрузить в CSV', permissions=['export'])
+    def export_csv(self, request, queryset):
+        return export_response('csv', *ticket_rows(queryset), 'tickets')
+
+    @admin.action(description='Выгрузить в JSONL', permissions=['export'])
+    def export_jsonl(self, request, queryset):
+        return export_response('jsonl', *ticket_rows(queryset), 'tickets')
 
 @admin.register(Attachment)
 class AttachmentAdmin(admin.ModelAdmin):
     list_display = ('ticket', 'file_name', 'uploaded_at', 'image_tag')
     search_fields = ('ticket__ticket_id',)
-    readonly_fields = ('image_tag',)
\ No newline at end of file
+    readonly_fields = ('image_tag',)
+
+class FaqArticleInline(admin.StackedInline):
+    model = FaqArticle
+    extra = 1
+
+@admin.register(BotTenant)
+class BotTenantAdmin(admin.ModelAdmin):
+    # Токен не выводится в списке; новые и отключённые боты подхватываются после перезапуска runbot
+    list_display = ('name', 'support_chat_id', 'is_active', 'updated_at')
+    list_filter = ('is_active',)
+    inlines = (FaqArticleInline,)
+
+class SectionInline(admin.TabularInline):
+    model = Section
+    extra = 1
+
+@admin.register(Page)
+class PageAdmin(admin.ModelAdmin):
+    list_display = ('name', 'tenant', 'position', 'updated_at')
+    list_editable = ('position',)
+    list_filter = ('tenant',)
+    inlines = (SectionInline,)
+
+@admin.register(TicketDailyStat)
+class TicketDailyStatAdmin(admin.ModelAdmin):
+    list_display = ('day', 'tenant_key', 'page', 'section', 'is_suggestion', 'status', 'count', 'average_resolution')
+    list_filter = ('tenant_key', 'is_suggestion', 'status', 'page')
+    date_hierarchy = 'day'
+
+    def average_resolution(self, obj):
+        if obj.status not in Ticket.RESOLVED_STATUSES or not obj.count:
+            return '-'
+        return timedelta(seconds=obj.resolution_seconds // obj.count)
+
+    average_resolution.short_description = 'Среднее время решения'
+
+    # Строки ведутся автоматически, руками их не правят
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
\ No newline at end of file
@@ -0,0 +1,162 @@
+import base64
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from tg_app.models import Attachment, Ticket, UserProfile
+
+try:
+    import zstandard
+except ImportError:  # без zstandard архив сжимается gzip
+    zstandard = None
+
+ARCHIVE_EXTENSION = '.jsonl.zst' if zstandard else '.jsonl.gz'
+USER_FIELDS = ('telegram_id', 'username', 'first_name', 'last_name')
+
+
+def archive_path(archive_dir, created_at):
+    """Архив разбит по месяцам создания заявки: tickets-2024-05.jsonl.zst."""
+    return Path(archive_dir) / f'tickets-{created_at:%Y-%m}{ARCHIVE_EXTENSION}'
+
+
+def attachment_path(archive_dir, ticket_id, file_name):
+    return Path(archive_dir) / 'attachments' / ticket_id / os.path.basename(file_name)
+
+
+def append_records(path, records, compression_level=3):
+    """Дописывает записи в архив отдельным сжатым кадром.
+
+    И zstd-кадры, и gzip-члены можно склеивать подряд, поэтому каждый пакет
+    дописывается без перечитывания уже сжатой части файла.
+    """
+    data = ''.join(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for record in records)
+    if zstandard:
+        compressed = zstandard.ZstdCompressor(level=compression_level).compress(data.encode('utf-8'))
+    else:
+        compressed = gzip.compress(data.encode('utf-8'), compresslevel=min(compression_level, 9))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'ab') as fh:
+        fh.write(compressed)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def iter_lines(path):
+    """Построчно читает архив, не распаковывая его целиком в память."""
+    if path.name.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f'Для чтения {path} требуется пакет zstandard')
+        with open(path, 'rb') as fh:
+            reader = zstandard.ZstdDecompressor().stream_reader(fh, read_across_frames=True)
+            yield from io.TextIOWrapper(reader, encoding='utf-8')
+    else:
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            yield from fh
+
+
+def serialize_ticket(ticket, archive_dir):
+    """Превращает заявку в запись архива, сохраняя изображения вложений отдельными файлами."""
+    record = {field.attname: getattr(ticket, field.attname) for field in Ticket._meta.concrete_fields}
+    record['user'] = {field: getattr(ticket.user, field) for field in USER_FIELDS}
+    record['attachments'] = []
+    for attachment in ticket.attachments.all():
+        path = attachment_path(archive_dir, ticket.ticket_id, attachment.file_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Заявка удаляется сразу после записи архива, поэтому изображение тоже сбрасывается на диск
+        with open(path, 'wb') as fh:
+            fh.write(base64.b64decode(attachment.file_data))
+            fh.flush()
+            os.fsync(fh.fileno())
+        record['attachments'].append({
+            'file_name': attachment.file_name,
+            'uploaded_at': attachment.uploaded_at,
+            'created_at': attachment.created_at,
+        })
+    return record
+
+
+def archive_batch(queryset, archive_dir, batch_size, compression_level=3):
+    """Архивирует и удаляет до `batch_size` заявок. Возвращает количество удалённых из базы."""
+    tickets = list(
+        queryset.order_by('pk').select_related('user').prefetch_related('attachments')[:batch_size]
+    )
+    if not tickets:
+        return 0
+
+    by_file = {}
+    for ticket in tickets:
+        by_file.setdefault(archive_path(archive_dir, ticket.created_at), []).append(
+            serialize_ticket(ticket, archive_dir)
+        )
+    for path, records in by_file.items():
+        append_records(path, records, compression_level)
+
+    # Удаляем только после того, как архив записан на диск; небольшой пакет держит блокировки недолго.
+    # Пока писались файлы, заявку могли переоткрыть в админке или дополнить из /mytickets,
+    # поэтому строки блокируются с повторной проверкой условий queryset. Такая заявка остаётся
+    # в базе, а её устаревшая копия в архиве не мешает: find_archived_ticket берёт последнюю копию.
+    with transaction.atomic():
+        pks = list(
+            queryset.filter(pk__in=[ticket.pk for ticket in tickets])
+            .select_for_update().values_list('pk', flat=True)
+        )
+        Ticket.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def find_archived_ticket(archive_dir, ticket_id):
+    """Ищет запись заявки в архиве. Возвращает None, если заявка не найдена.
+
+    Восстановленная и снова заархивированная заявка попадает в тот же месячный файл
+    ещё раз, поэтому возвращается последняя, самая свежая копия.
+    """
+    needle = f'"ticket_id": "{ticket_id}"'
+    for path in sorted(Path(archive_dir).glob('tickets-*.jsonl.*'), reverse=True):
+        found = None
+        for line in iter_lines(path):
+            if needle in line:
+                found = line
+        if found is not None:
+            return json.loads(found)
+    return None
+
+
+@transaction.atomic
+def restore_ticket(record, archive_dir):
+    """Восстанавливает заявку из записи архива вместе с пользователем и вложениями."""
+    user_data = record.pop('user')
+    attachments = record.pop('attachments')
+
+    user, _ = UserProfile.objects.get_or_create(
+        telegram_id=user_data['telegram_id'],
+        defaults={field: user_data[field] for field in USER_FIELDS if field != 'telegram_id'},
+    )
+
+    fields = {field.attname: field for field in Ticket._meta.concrete_fields}
+    values = {name: fields[name].to_python(value) for name, value in record.items() if name in fields}
+    values['user_id'] = user.pk
+    # bulk_create, а не save(): архивация не вычитает заявку из TicketDailyStat,
+    # поэтому восстановление не должно учитывать её повторно
+    ticket = Ticket(**values)
+    # updated_at остаётся временем восстановления (auto_now): иначе старая закрытая заявка
+    # снова подходит под ARCHIVE_AFTER_DAYS и уйдёт в архив при следующем запуске.
+    # Исходное время изменения сохраняется в записи архива.
+    Ticket.objects.bulk_create([ticket])
+
+    created_at_field = Attachment._meta.get_field('created_at')
+    for attachment in attachments:
+        created = Attachment.objects.create(
+            ticket=ticket,
+            file_name=attachment['file_name'],
+            file_data=base64.b64encode(
+                attachment_path(archive_dir, ticket.ticket_id, attachment['file_name']).read_bytes()
+            ).decode('utf-8'),
+            uploaded_at=Attachment._meta.get_field('uploaded_at').to_python(attachment['uploaded_at']),
+        )
+        Attachment.objects.filter(pk=created.pk).update(created_at=created_at_field.to_python(attachment['created_at']))
+    return ticket
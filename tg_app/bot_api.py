@@ -0,0 +1,65 @@
+from django.conf import settings
+from telegram.error import TimedOut
+from telegram.request import HTTPXRequest
+
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest, считающий загрузку пула соединений к Bot API."""
+
+    def __init__(self, name, connection_pool_size=1, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+        self.name = name
+        self.pool_size = connection_pool_size
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.pool_timeouts = 0
+        self.errors = 0
+
+    async def do_request(self, *args, **kwargs):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await super().do_request(*args, **kwargs)
+        except TimedOut as e:
+            if str(e).startswith('Pool timeout'):
+                self.pool_timeouts += 1
+            self.errors += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    @property
+    def waiting(self):
+        """Сколько запросов сейчас ждут свободного соединения."""
+        return max(self.in_flight - self.pool_size, 0)
+
+    @property
+    def utilisation(self):
+        return min(self.in_flight, self.pool_size) / self.pool_size
+
+    def as_text(self):
+        return (
+            f"HTTP {self.name}: пул {self.pool_size}, HTTP/{self.http_version}, "
+            f"загрузка {self.utilisation:.0%}, ждут соединения {self.waiting}, "
+            f"пик одновременных запросов {self.peak_in_flight}, запросов {self.requests}, "
+            f"ошибок {self.errors}, таймаутов пула {self.pool_timeouts}"
+        )
+
+
+def build_requests(bot_count=1):
+    """Создаёт объекты запросов для обычных вызовов Bot API и для getUpdates.
+
+    Запросы общие для всех ботов процесса. Каждый бот держит открытым свой долгий
+    опрос getUpdates, поэтому в его пуле не меньше `bot_count` соединений.
+    """
+    get_updates_options = dict(settings.TELEGRAM_GET_UPDATES_HTTP)
+    get_updates_options['connection_pool_size'] = max(get_updates_options['connection_pool_size'], bot_count)
+    return (
+        InstrumentedHTTPXRequest('api', **settings.TELEGRAM_HTTP),
+        InstrumentedHTTPXRequest('getUpdates', **get_updates_options),
+    )
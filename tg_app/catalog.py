@@ -0,0 +1,103 @@
+import logging
+import time
+from types import MappingProxyType
+
+from django.db.models import Count, Max
+from telegram import KeyboardButton, ReplyKeyboardMarkup
+
+from tg_app.db import database_sync_to_async
+from tg_app.models import Page, Section
+
+logger = logging.getLogger(__name__)
+
+CANCEL_BUTTON = "Отмена"
+
+# Каталог по умолчанию, пока в базе не заведено ни одной страницы
+DEFAULT_CATALOG = (
+    ("Бюджет", ("Расходы", "Доходы", "Счета", "План")),
+    ("Профиль", ()),
+    ("Лента", ("Новости", "Kase", "Медиа", "Авторы")),
+    ("Инвестиции", ("Все", "Депозит", "Фондовый рынок", "Краудфандинг", "Долевой бизнес", "Криптовалюта")),
+    ("Долги", ("Все", "Кредиты", "Рассрочки", "Мои долги", "Мои должники")),
+    ("Другое", ()),
+)
+
+CANCEL_KEYBOARD = ReplyKeyboardMarkup([[KeyboardButton(CANCEL_BUTTON)]], resize_keyboard=True, one_time_keyboard=True)
+
+
+def build_keyboard(labels, columns=2):
+    """Раскладывает кнопки по `columns` в ряд и добавляет кнопку отмены."""
+    rows = [
+        [KeyboardButton(label) for label in labels[i:i + columns]]
+        for i in range(0, len(labels), columns)
+    ]
+    if rows and len(rows[-1]) < columns:
+        rows[-1].append(KeyboardButton(CANCEL_BUTTON))
+    else:
+        rows.append([KeyboardButton(CANCEL_BUTTON)])
+    return ReplyKeyboardMarkup(rows, resize_keyboard=True, one_time_keyboard=True)
+
+
+class Catalog:
+    """Неизменяемое дерево страниц и вкладок с заранее собранными клавиатурами."""
+
+    def __init__(self, tree):
+        self.tree = tuple((page, tuple(sections)) for page, sections in tree)
+        self.pages_keyboard = build_keyboard([page for page, _ in self.tree])
+        self._sections = MappingProxyType({page: frozenset(sections) for page, sections in self.tree})
+        self._section_keyboards = MappingProxyType({
+            page: build_keyboard(list(sections)) for page, sections in self.tree if sections
+        })
+
+    def has_page(self, page):
+        return page in self._sections
+
+    def has_section(self, page, section):
+        return section in self._sections.get(page, ())
+
+    def section_keyboard(self, page):
+        """Клавиатура вкладок страницы или None, если у страницы нет вкладок."""
+        return self._section_keyboards.get(page)
+
+
+class CatalogCache:
+    """Держит собранный каталог и перечитывает его из базы после правок в админке.
+
+    Версия каталога — это количество и последнее время изменения страниц и вкладок.
+    Проверка версии выполняется не чаще, чем раз в `reload_interval` секунд,
+    поэтому правки из другого процесса подхватываются без перезапуска бота.
+
+    Боту `tenant_id` показываются его страницы, а если их нет — общие страницы без бота.
+    """
+
+    def __init__(self, reload_interval, tenant_id=None):
+        self.reload_interval = reload_interval
+        self.tenant_id = tenant_id
+        self._catalog = None
+        self._version = None
+        self._checked_at = 0.0
+
+    async def get(self):
+        if self._catalog is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            await database_sync_to_async(self._reload_if_changed, idempotent=True)()
+        return self._catalog
+
+    def _reload_if_changed(self):
+        self._checked_at = time.monotonic()
+        version = (
+            tuple(Page.objects.aggregate(Count('id'), Max('updated_at')).values()),
+            tuple(Section.objects.aggregate(Count('id'), Max('updated_at')).values()),
+        )
+        if self._catalog is not None and version == self._version:
+            return
+
+        pages = Page.objects.prefetch_related('sections')
+        tree = self._tree(pages.filter(tenant_id=self.tenant_id)) if self.tenant_id else []
+        tree = tree or self._tree(pages.filter(tenant__isnull=True))
+        self._catalog = Catalog(tree or DEFAULT_CATALOG)
+        self._version = version
+        logger.info("Каталог страниц загружен: %d страниц", len(self._catalog.tree))
+
+    @staticmethod
+    def _tree(pages):
+        return [(page.name, [section.name for section in page.sections.all()]) for page in pages]
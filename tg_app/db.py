@@ -0,0 +1,55 @@
+import functools
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+# Время последней проверки соединений. Меняется только в потоке,
+# в котором sync_to_async(thread_sensitive=True) выполняет ORM-вызовы.
+_last_checked_at = 0.0
+
+
+def _prepare_connections():
+    """Закрывает устаревшие и сломанные соединения перед ORM-вызовом.
+
+    В процессе бота нет цикла запрос-ответ, в котором Django обычно вызывает
+    close_old_connections(). Без этого CONN_MAX_AGE и CONN_HEALTH_CHECKS не работают,
+    и после перезапуска базы бот продолжает использовать разорванное соединение.
+    Проверка выполняется после ошибки или если с прошлой прошло больше
+    DB_HEALTH_CHECK_INTERVAL секунд, чтобы не добавлять SELECT 1 к каждому запросу.
+    """
+    global _last_checked_at
+    now = time.monotonic()
+    if connection.errors_occurred or now - _last_checked_at >= settings.DB_HEALTH_CHECK_INTERVAL:
+        close_old_connections()
+        _last_checked_at = now
+
+
+def database_sync_to_async(func, idempotent=False):
+    """sync_to_async для ORM-вызовов из обработчиков бота с переиспользованием соединения.
+
+    Если соединение разорвано (например, база перезапущена между проверками), вызов
+    с idempotent=True повторяется один раз на новом соединении. Остальные вызовы не
+    повторяются: соединение могло оборваться уже после COMMIT, и повтор создал бы
+    заявку второй раз. Внутри транзакции повтор невозможен.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _prepare_connections()
+        try:
+            return func(*args, **kwargs)
+        except (OperationalError, InterfaceError):
+            if not idempotent or connection.in_atomic_block:
+                raise
+            close_old_connections()
+            # Соединение живо — ошибка в самом запросе, повтор не поможет
+            if connection.connection is not None:
+                raise
+            logger.warning("Соединение с базой разорвано, повторяем %s", getattr(func, '__qualname__', func))
+            return func(*args, **kwargs)
+
+    return sync_to_async(wrapper, thread_sensitive=True)
@@ -0,0 +1,164 @@
+import csv
+import io
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+TICKET_FIELDS = (
+    'ticket_id', 'tenant__name', 'status', 'is_suggestion', 'page', 'section', 'description', 'additional_info',
+    'created_at', 'updated_at', 'resolved_at',
+    'user__telegram_id', 'user__username', 'user__first_name', 'user__last_name',
+)
+ATTACHMENT_FIELDS = ('attachments__file_name', 'attachments__file_data')
+USER_FIELDS = ('telegram_id', 'username', 'first_name', 'last_name', 'created_at', 'updated_at')
+
+
+def filter_tickets(queryset, date_from=None, date_to=None, page=None, ticket_type=None, tenant=None):
+    """Применяет фильтры выгрузки: диапазон дат создания, страница, тип обращения и бот."""
+    if date_from:
+        queryset = queryset.filter(created_at__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__date__lte=date_to)
+    if page:
+        queryset = queryset.filter(page=page)
+    if tenant:
+        queryset = queryset.filter(tenant__name=tenant)
+    if ticket_type == 'ticket':
+        queryset = queryset.filter(is_suggestion=False)
+    elif ticket_type == 'suggestion':
+        queryset = queryset.filter(is_suggestion=True)
+    return queryset
+
+
+def ticket_rows(queryset, include_attachments=False):
+    """Заголовок и строки выгрузки заявок.
+
+    Вложения по умолчанию не выгружаются. С `include_attachments` каждое вложение
+    даёт отдельную строку с данными заявки.
+    """
+    fields = TICKET_FIELDS + ATTACHMENT_FIELDS if include_attachments else TICKET_FIELDS
+    # iterator() на PostgreSQL читает через серверный курсор порциями по chunk_size строк
+    rows = queryset.order_by('pk').values_list(*fields).iterator(chunk_size=2000)
+    return [field.replace('__', '_') for field in fields], rows
+
+
+def user_rows(queryset):
+    rows = queryset.order_by('pk').values_list(*USER_FIELDS).iterator(chunk_size=2000)
+    return list(USER_FIELDS), rows
+
+
+def filter_users(queryset, date_from=None, date_to=None):
+    """Применяет к пользователям фильтр по дате регистрации."""
+    if date_from:
+        queryset = queryset.filter(created_at__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__date__lte=date_to)
+    return queryset
+
+
+class _Echo:
+    """Файлоподобный объект, который просто возвращает записанное (для csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(header)  # BOM, чтобы Excel распознал UTF-8
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(header, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + '\n'
+
+
+class _ParquetSink(io.RawIOBase):
+    """Приёмник для ParquetWriter: копит записанные байты до выдачи клиенту.
+
+    tell() возвращает общее число записанных байт, по нему Parquet считает смещения в футере.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_parquet(header, rows, row_group_size=10000):
+    """Пишет Parquet по группам строк, отдавая байты после каждой группы."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ParquetSink()
+    writer = None
+    batch = []
+
+    def flush():
+        nonlocal writer
+        table = pa.table({name: [row[i] for row in batch] for i, name in enumerate(header)})
+        if writer is None:
+            # Колонки, в которых в первой группе одни NULL, записываем как строки
+            schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(table.cast(writer.schema))
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= row_group_size:
+            flush()
+            yield sink.drain()
+    if batch or writer is None:
+        flush()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(export_format, header, rows):
+    if export_format == 'csv':
+        return stream_csv(header, rows)
+    if export_format == 'jsonl':
+        return stream_jsonl(header, rows)
+    if export_format == 'parquet':
+        return stream_parquet(header, rows)
+    raise ValueError(f'Неизвестный формат выгрузки: {export_format}')
+
+
+def export_response(export_format, header, rows, name):
+    """StreamingHttpResponse, который начинает отдавать данные до окончания выборки."""
+    response = StreamingHttpResponse(
+        stream_export(export_format, header, rows), content_type=EXPORT_FORMATS[export_format]
+    )
+    filename = f'{name}-{timezone.now():%Y%m%d-%H%M%S}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,154 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+
+class FaqEntry(NamedTuple):
+    question: str
+    answer: str
+
+
+FAQ_INTRO = "Убедитесь, что у вас установлена последняя версия приложения в App Store/Google Play Market."
+
+FAQ_ENTRIES = [
+    FaqEntry(
+        "Как завести бюджет в приложении?",
+        "Для добавления бюджета, нажмите на раздел “Бюджеты” и выберите “Создать новый бюджет”. "
+        "Заполните название, категории расходов и планируемую сумму. Нажмите “Сохранить” для сохранения.",
+    ),
+    FaqEntry(
+        "Как отслеживать долги в приложении?",
+        "В разделе “Долги” нажмите на “Добавить новый долг”. Укажите сумму долга, дату выплаты и контакт для связи. "
+        "При выплате обновляйте статус долга, чтобы видеть прогресс.",
+    ),
+    FaqEntry(
+        "Как работает кредитный калькулятор?",
+        "Выберите раздел “Кредитный калькулятор”. Введите сумму кредита, процентную ставку и срок в месяцах. "
+        "Кликните на “Рассчитать”, чтобы получить ежемесячные платежи и итоговую сумму.",
+    ),
+    FaqEntry(
+        "Как добавить инвестиции в приложение?",
+        "Перейдите в раздел “Инвестиции” и нажмите “Добавить инвестицию”. Укажите тип инвестиции, сумму и срок вложения. "
+        "Приложение автоматически рассчитает прогнозируемый доход.",
+    ),
+    FaqEntry(
+        "Можно ли настроить уведомления о финансовых событиях?",
+        "Да, в разделе “Настройки” выберите “Уведомления” и настройте оповещения о запланированных выплатах, "
+        "изменениях бюджета и инвестициях.",
+    ),
+]
+
+
+def render_faq_text(entries, intro=FAQ_INTRO):
+    """Собирает текст FAQ для отправки пользователю."""
+    parts = [f"\n\n{intro}\n"]
+    for number, entry in enumerate(entries, start=1):
+        parts.append(f"{number}. {entry.question}\nОтвет: {entry.answer}\n")
+    return "\n".join(parts)
+
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_STOP_WORDS = frozenset({
+    'как', 'что', 'это', 'для', 'при', 'или', 'где', 'мне', 'мой', 'моя', 'мои', 'меня',
+    'так', 'все', 'уже', 'есть', 'нет', 'когда', 'почему', 'можно', 'нужно', 'чтобы',
+    'после', 'через', 'если', 'его', 'она', 'они', 'вас', 'ваш', 'нам', 'наш', 'the', 'and',
+    # Основы, которые встречаются почти в каждом обращении и ничего не различают.
+    # Сравниваются уже после _stem: "приложение" и "приложений" дают "приложен", остальные формы — "приложени"
+    'приложен', 'приложени', 'investudy',
+})
+
+# Грубый стемминг: отрезаем самые частые окончания, чтобы "долги" и "долгов" совпадали.
+_ENDINGS = sorted((
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ов', 'ев', 'ей', 'ий', 'ый', 'ой', 'ая', 'яя',
+    'ое', 'ее', 'ие', 'ые', 'ом', 'ем', 'ах', 'ях', 'ам', 'ям', 'ть', 'а', 'я', 'о', 'е',
+    'ы', 'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+
+
+def _stem(token):
+    for ending in _ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= 3:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text):
+    """Разбивает текст на нормализованные термины."""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower().replace('ё', 'е')):
+        if len(token) < 3 or token in _STOP_WORDS:
+            continue
+        term = _stem(token)
+        if term not in _STOP_WORDS:
+            terms.append(term)
+    return terms
+
+
+class FaqIndex:
+    """BM25-индекс по записям FAQ.
+
+    Веса всех пар (термин, документ) считаются один раз при построении,
+    поэтому поиск сводится к суммированию по спискам вхождений терминов запроса.
+    """
+
+    def __init__(self, entries, k1=1.5, b=0.75, question_boost=2):
+        self.entries = list(entries)
+        self._postings = defaultdict(list)
+
+        documents = []
+        for entry in self.entries:
+            terms = tokenize(entry.question) * question_boost + tokenize(entry.answer)
+            documents.append(Counter(terms))
+
+        doc_count = len(documents)
+        avg_length = sum(sum(doc.values()) for doc in documents) / doc_count if doc_count else 0
+        doc_freq = Counter(term for doc in documents for term in doc)
+
+        for doc_id, doc in enumerate(documents):
+            length_norm = k1 * (1 - b + b * sum(doc.values()) / avg_length) if avg_length else k1
+            for term, freq in doc.items():
+                idf = math.log(1 + (doc_count - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                self._postings[term].append((doc_id, idf * freq * (k1 + 1) / (freq + length_norm)))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, text, limit=1):
+        """Возвращает до `limit` пар (score, FaqEntry), отсортированных по убыванию score."""
+        scores = defaultdict(float)
+        for term in set(tokenize(text)):
+            for doc_id, weight in self._postings.get(term, ()):
+                scores[doc_id] += weight
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, self.entries[doc_id]) for doc_id, score in best]
+
+    def best_match(self, text, min_score):
+        """Возвращает лучшую запись FAQ или None, если совпадение слабее `min_score`."""
+        results = self.search(text, limit=1)
+        if results and results[0][0] >= min_score:
+            return results[0][1]
+        return None
+
+
+class FaqMetrics:
+    """Счётчики автоматических ответов из FAQ."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.offered = 0
+        self.deflected = 0
+        self.escalated = 0
+
+    @property
+    def deflection_rate(self):
+        return self.deflected / self.offered if self.offered else 0.0
+
+    def as_text(self):
+        return (
+            f"FAQ: проверено {self.lookups}, предложено {self.offered}, "
+            f"решено {self.deflected}, передано в поддержку {self.escalated}, "
+            f"доля решённых {self.deflection_rate:.0%}"
+        )
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q, TextField, Value
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+
+from tg_app.models import Ticket, UserProfile
+
+PAGE_SIZE = 5
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(created_at, pk):
+    """Курсор страницы для callback_data: микросекунды от эпохи и id последней заявки.
+
+    callback_data ограничена 64 байтами, поэтому вместо ISO-даты хранится целое число.
+    """
+    return f'{(created_at - _EPOCH) // timedelta(microseconds=1)}.{pk}'
+
+
+def decode_cursor(value):
+    microseconds, pk = value.split('.')
+    return _EPOCH + timedelta(microseconds=int(microseconds)), int(pk)
+
+
+def ticket_page(telegram_id, tenant_id, cursor=None, page_size=PAGE_SIZE):
+    """Страница заявок пользователя от новых к старым и курсор следующей страницы.
+
+    Keyset-пагинация по (created_at, id): следующая страница начинается строго после
+    последней показанной заявки, поэтому запрос читает из индекса ticket_user_tenant_created_idx
+    только page_size + 1 строк, сколько бы заявок ни было у пользователя в этом и других ботах.
+    """
+    user_profile = UserProfile.objects.filter(telegram_id=telegram_id).first()
+    if user_profile is None:
+        return [], None
+
+    tickets = user_profile.tickets.filter(tenant_id=tenant_id)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        # Условие created_at <= ... задаёт границу диапазона индекса, второе отсекает равные даты
+        tickets = tickets.filter(Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+    rows = list(
+        tickets.order_by('-created_at', '-id')
+        .values('id', 'ticket_id', 'status', 'is_suggestion', 'created_at')[:page_size + 1]
+    )
+    if len(rows) <= page_size:
+        return rows, None
+    last = rows[page_size - 1]
+    return rows[:page_size], encode_cursor(last['created_at'], last['id'])
+
+
+def get_user_ticket(telegram_id, tenant_id, pk):
+    """Заявка пользователя из этого бота или None: id в callback_data нельзя принимать на веру."""
+    return Ticket.objects.filter(pk=pk, user__telegram_id=telegram_id, tenant_id=tenant_id).first()
+
+
+def add_follow_up(ticket_pk, text):
+    """Дописывает дополнение пользователя в additional_info заявки одним UPDATE.
+
+    updated_at обновляется явно, чтобы заявку с недавним дополнением не заархивировали.
+    """
+    note = f"\n\nДополнение от {timezone.localtime():%d.%m.%Y %H:%M}:\n{text}"
+    Ticket.objects.filter(pk=ticket_pk).update(
+        additional_info=Concat(
+            Coalesce('additional_info', Value(''), output_field=TextField()), Value(note), output_field=TextField()
+        ),
+        updated_at=timezone.now(),
+    )
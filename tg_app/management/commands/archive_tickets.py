@@ -0,0 +1,55 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from tg_app.archive import archive_batch
+from tg_app.models import Ticket
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые закрытые заявки в сжатый архив и удаляет их из базы небольшими пакетами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Архивировать заявки, не изменявшиеся указанное число дней')
+        parser.add_argument('--status', nargs='+', default=list(settings.ARCHIVE_STATUSES))
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--archive-dir', default=settings.ARCHIVE_DIR)
+        parser.add_argument('--pause', type=float, default=0.5,
+                            help='Пауза между пакетами в секундах, чтобы не мешать боту')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Если задано, повторять архивацию каждые N секунд')
+
+    def handle(self, *args, **options):
+        if not options['interval']:
+            self.archive(options)
+            return
+
+        while True:
+            # Между запусками база могла перезапуститься, а соединение живёт CONN_MAX_AGE секунд
+            close_old_connections()
+            try:
+                self.archive(options)
+            except Exception as e:
+                # Ошибка одного запуска не должна останавливать сервис архивации
+                self.stderr.write(f'Ошибка архивации, повтор через {options["interval"]} s: {e!r}')
+            time.sleep(options['interval'])
+
+    def archive(self, options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        queryset = Ticket.objects.filter(status__in=options['status'], updated_at__lt=cutoff)
+
+        total = 0
+        while True:
+            archived = archive_batch(
+                queryset, options['archive_dir'], options['batch_size'], settings.ARCHIVE_COMPRESSION_LEVEL
+            )
+            if not archived:
+                break
+            total += archived
+            time.sleep(options['pause'])
+        self.stdout.write(f'Заархивировано заявок: {total}')
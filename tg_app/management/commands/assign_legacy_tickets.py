@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tg_app.models import BotTenant, Ticket, TicketDailyStat
+
+
+class Command(BaseCommand):
+    help = ('Привязывает заявки бота из настроек (без BotTenant) и их статистику к боту из базы. '
+            'Нужно один раз после того, как существующий бот заведён как BotTenant, иначе старые '
+            'заявки не видны в /mytickets и /stats')
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', help='Имя BotTenant')
+
+    def handle(self, *args, **options):
+        tenant = BotTenant.objects.filter(name=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f'Бот {options["tenant"]} не найден')
+
+        with transaction.atomic():
+            # update() не вызывает Ticket.save(), поэтому статистика переносится ниже одним проходом
+            tickets = Ticket.objects.filter(tenant__isnull=True).update(tenant=tenant)
+            rows = 0
+            for row in TicketDailyStat.objects.filter(tenant_key=0).select_for_update():
+                TicketDailyStat.apply(
+                    (row.day, tenant.pk, row.page, row.section, row.is_suggestion, row.status),
+                    row.count, row.resolution_seconds,
+                )
+                row.delete()
+                rows += 1
+        self.stdout.write(f'Бот {tenant.name}: привязано заявок {tickets}, перенесено строк статистики {rows}')
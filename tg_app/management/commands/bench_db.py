@@ -0,0 +1,73 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+
+from tg_app.db import database_sync_to_async
+from tg_app.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Сравнение задержки ORM-запросов бота с новыми и переиспользуемыми соединениями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help='Количество одновременных "пользователей"')
+        parser.add_argument('--queries', type=int, default=50, help='Запросов на одного пользователя')
+        parser.add_argument('--mode', choices=('fresh', 'reuse', 'both'), default='both',
+                            help='fresh — новое соединение на каждый запрос, reuse — текущие настройки')
+
+    def handle(self, *args, **options):
+        modes = ('fresh', 'reuse') if options['mode'] == 'both' else (options['mode'],)
+        for mode in modes:
+            close_old_connections()
+            connection.close()
+            self.run_mode(mode, options['concurrency'], options['queries'])
+
+    def run_mode(self, mode, concurrency, queries):
+        created = []
+
+        def on_connection_created(sender, connection, **kwargs):
+            created.append(connection.alias)
+
+        def query():
+            UserProfile.objects.filter(telegram_id=0).exists()
+            if mode == 'fresh':
+                # Так вёл себя бот без CONN_MAX_AGE: каждое обращение открывало новое соединение
+                connection.close()
+
+        run_query = database_sync_to_async(query, idempotent=True)
+        latencies = []
+
+        async def user():
+            for _ in range(queries):
+                started = time.perf_counter()
+                await run_query()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        async def run():
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+
+        connection_created.connect(on_connection_created)
+        try:
+            started = time.perf_counter()
+            asyncio.run(run())
+            total = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(on_connection_created)
+
+        latencies.sort()
+        self.stdout.write(
+            f'{mode:>5}: запросов={len(latencies)} за {total:.2f} s ({len(latencies) / total:.0f}/s), '
+            f'p50={statistics.median(latencies):.2f} ms p95={latencies[int(len(latencies) * 0.95)]:.2f} ms, '
+            f'открыто соединений={len(created)}, активных на сервере={self.server_connections()}'
+        )
+
+    def server_connections(self):
+        if connection.vendor != 'postgresql':
+            return 'н/д'
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+            return cursor.fetchone()[0]
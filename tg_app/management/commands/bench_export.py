@@ -0,0 +1,76 @@
+import resource
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tg_app.export import EXPORT_FORMATS, stream_export, ticket_rows
+from tg_app.models import Ticket, UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Замер скорости и пикового потребления памяти потоковой выгрузки заявок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=tuple(EXPORT_FORMATS), nargs='+', default=['csv', 'jsonl'])
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Создать указанное число тестовых заявок на время замера. '
+                                 'Они создаются в транзакции, которая откатывается после замера')
+        parser.add_argument('--attachments', action='store_true')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            self.bench(options)
+            # Тестовые заявки не должны остаться ни в базе, ни в расхождениях с TicketDailyStat
+            transaction.set_rollback(True)
+
+    def bench(self, options):
+        for export_format in options['format']:
+            baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            header, rows = ticket_rows(Ticket.objects.all(), include_attachments=options['attachments'])
+            counted = CountingRows(rows)
+
+            started = time.perf_counter()
+            first_chunk_at = None
+            size = 0
+            for chunk in stream_export(export_format, header, counted):
+                if first_chunk_at is None:
+                    first_chunk_at = time.perf_counter() - started
+                size += len(chunk)
+            elapsed = time.perf_counter() - started
+
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.stdout.write(
+                f'{export_format:>7}: строк {counted.count} за {elapsed:.2f} s '
+                f'({counted.count / elapsed:.0f} строк/s), первый фрагмент через {first_chunk_at * 1000:.0f} ms, '
+                f'{size / 1024 / 1024:.1f} MiB, пиковый RSS {peak_kb / 1024:.0f} MiB '
+                f'(+{(peak_kb - baseline_kb) / 1024:.0f} MiB за выгрузку)'
+            )
+
+    def seed(self, count, batch_size=5000):
+        user, _ = UserProfile.objects.get_or_create(telegram_id=0, defaults={'username': 'bench'})
+        for offset in range(0, count, batch_size):
+            # bulk_create не вызывает Ticket.save(), поэтому ticket_id задаётся явно
+            Ticket.objects.bulk_create([
+                Ticket(
+                    ticket_id=uuid4().hex[:8], user=user, page='Бюджет', section='Расходы',
+                    description='Тестовое описание проблемы для замера выгрузки ' * 5,
+                    additional_info='iPhone 15, iOS 18, версия 2.3.1',
+                )
+                for _ in range(min(batch_size, count - offset))
+            ])
+        self.stdout.write(f'Создано тестовых заявок: {count} (будут удалены после замера)')
+
+
+class CountingRows:
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
@@ -0,0 +1,56 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from tg_app.faq import FAQ_ENTRIES, FaqEntry, FaqIndex, tokenize
+
+
+class Command(BaseCommand):
+    help = 'Замер времени построения индекса FAQ и поиска по нему при росте числа записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000])
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = sorted({
+            word for entry in FAQ_ENTRIES
+            for word in (entry.question + ' ' + entry.answer).split()
+        })
+
+        def sentence(length):
+            # Реальные слова FAQ вперемешку с синтетическими, чтобы словарь рос вместе с индексом
+            return ' '.join(
+                rng.choice(vocabulary) if rng.random() < 0.5 else f'термин{rng.randrange(20000)}'
+                for _ in range(length)
+            )
+
+        queries = [sentence(rng.randint(5, 30)) for _ in range(options['queries'])]
+
+        for size in options['sizes']:
+            entries = FAQ_ENTRIES + [
+                FaqEntry(sentence(8), sentence(40)) for _ in range(max(size - len(FAQ_ENTRIES), 0))
+            ]
+
+            started = time.perf_counter()
+            index = FaqIndex(entries)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                index.best_match(query, min_score=0)
+                latencies.append((time.perf_counter() - started) * 1_000_000)
+            latencies.sort()
+
+            self.stdout.write(
+                f'entries={len(index):>6} build={build_ms:8.1f} ms '
+                f'p50={statistics.median(latencies):8.1f} us '
+                f'p95={latencies[int(len(latencies) * 0.95)]:8.1f} us '
+                f'max={latencies[-1]:8.1f} us '
+                f'avg_terms={statistics.mean(len(tokenize(q)) for q in queries):.1f}'
+            )
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from telegram import Bot
+
+from tg_app.bot_api import InstrumentedHTTPXRequest
+
+BENCH_TOKEN = '123456:bench'
+
+GET_ME_RESULT = {'id': 123456, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+MESSAGE_RESULT = {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': 'ok'}
+
+
+class FakeBotApi:
+    """Минимальный HTTP/1.1-сервер, отвечающий как Bot API с заданной задержкой."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                headers = dict(line.split(': ', 1) for line in header_lines if ': ' in line)
+                length = int(headers.get('Content-Length') or headers.get('content-length') or 0)
+                if length:
+                    await reader.readexactly(length)
+
+                await asyncio.sleep(self.delay)
+                method = request_line.split()[1].rsplit('/', 1)[-1]
+                result = GET_ME_RESULT if method == 'getMe' else MESSAGE_RESULT
+                body = json.dumps({'ok': True, 'result': result}).encode()
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    + f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+class Command(BaseCommand):
+    help = 'Пропускная способность отправки сообщений через локальный фейковый Bot API при разных размерах пула'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 4, 16, 64])
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--delay-ms', type=float, default=20, help='Задержка ответа фейкового сервера')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        api = FakeBotApi(options['delay_ms'] / 1000)
+        server = await asyncio.start_server(api.handle, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async with server:
+            for pool_size in options['pool_sizes']:
+                api.connections = 0
+                request = InstrumentedHTTPXRequest(
+                    'bench',
+                    **dict(settings.TELEGRAM_HTTP, connection_pool_size=pool_size, pool_timeout=None),
+                )
+                bot = Bot(BENCH_TOKEN, base_url=f'http://127.0.0.1:{port}/bot', request=request)
+                async with bot:
+                    started = time.perf_counter()
+                    await asyncio.gather(*(
+                        bot.send_message(chat_id=1, text='bench') for _ in range(options['messages'])
+                    ))
+                    elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f'pool={pool_size:>4}: {options["messages"] / elapsed:8.1f} msg/s, '
+                    f'пик ожидающих соединения {max(request.peak_in_flight - pool_size, 0)}, '
+                    f'открыто соединений сервером {api.connections}, ошибок {request.errors}'
+                )
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Замер времени холодного импорта бота через python -X importtime (для CI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='tg_app.telegram_bot')
+        parser.add_argument('--budget-ms', type=float, default=settings.STARTUP_IMPORT_BUDGET_MS,
+                            help='Завершиться с ошибкой, если импорт занял больше указанного времени')
+        parser.add_argument('--top', type=int, default=15, help='Сколько самых медленных модулей показать')
+        parser.add_argument('--runs', type=int, default=3, help='Количество запусков, берётся лучший')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'ProjectTG.settings'))
+        best = None
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f'import {options["module"]}'],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            wall_ms = (time.perf_counter() - started) * 1000
+            if result.returncode != 0:
+                raise CommandError(f'Импорт {options["module"]} завершился ошибкой:\n{result.stderr[-2000:]}')
+            timings = parse_importtime(result.stderr)
+            total_ms = sum(cumulative for cumulative, name in timings if not name.startswith(' ')) / 1000
+            if best is None or total_ms < best[0]:
+                best = (total_ms, wall_ms, timings)
+
+        total_ms, wall_ms, timings = best
+        self.stdout.write(f'Самые медленные модули ({options["module"]}):')
+        for cumulative, name in sorted(timings, reverse=True)[:options['top']]:
+            self.stdout.write(f'{cumulative / 1000:10.1f} ms  {name.strip()}')
+        self.stdout.write(f'Импорт: {total_ms:.1f} ms, запуск процесса целиком: {wall_ms:.1f} ms, '
+                          f'бюджет: {options["budget_ms"]:.0f} ms')
+
+        if total_ms > options['budget_ms']:
+            raise CommandError(f'Время импорта {total_ms:.1f} ms превышает бюджет {options["budget_ms"]:.0f} ms')
+
+
+def parse_importtime(stderr):
+    """Возвращает пары (cumulative в микросекундах, имя модуля с отступом вложенности)."""
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, _, rest = line.partition(':')
+        self_us, cumulative_us, name = rest.split('|', 2)
+        if not cumulative_us.strip().isdigit():
+            continue  # строка заголовка
+        # Первый пробел после "|" — разделитель, остальные обозначают вложенность
+        timings.append((int(cumulative_us), name[1:]))
+    return timings
@@ -0,0 +1,58 @@
+import gc
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tg_app.faq import FAQ_ENTRIES
+from tg_app.telegram_bot import build_applications
+from tg_app.tenants import TenantConfig
+from tg_app.userdata import current_rss_bytes
+
+
+class Command(BaseCommand):
+    help = ('Замер памяти на каждого дополнительного бота в одном процессе: '
+            'с общими HTTP-клиентами и FAQ и с отдельными на каждого бота')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=50)
+        parser.add_argument('--max-kb-per-tenant', type=float, default=512,
+                            help='Допустимый прирост памяти Python на одного бота при общих ресурсах')
+
+    def handle(self, *args, **options):
+        # Фиктивные токены: приложения только собираются, к Bot API никто не обращается
+        tenants = [
+            TenantConfig(number, f'bench-{number}', f'{100000 + number}:{"A" * 35}', '-1', tuple(FAQ_ENTRIES))
+            for number in range(1, options['tenants'] + 1)
+        ]
+        # Первая сборка прогревает импорты и кэши модулей, чтобы не учитывать их в замере
+        build_applications(tenants[:1])
+
+        shared = self.measure(lambda: build_applications(tenants))
+        isolated = self.measure(lambda: [app for tenant in tenants for app in build_applications([tenant])])
+
+        for title, (python_kb, rss_kb) in (('общие ресурсы', shared), ('отдельные ресурсы', isolated)):
+            self.stdout.write(
+                f'{title:>17}: {python_kb / len(tenants):.0f} KiB Python-объектов и '
+                f'{rss_kb / len(tenants):.0f} KiB RSS на бота ({len(tenants)} ботов)'
+            )
+
+        per_tenant_kb = shared[0] / len(tenants)
+        if per_tenant_kb > options['max_kb_per_tenant']:
+            raise CommandError(
+                f'Бот добавляет {per_tenant_kb:.0f} KiB, допустимо {options["max_kb_per_tenant"]:.0f} KiB'
+            )
+
+    @staticmethod
+    def measure(build):
+        """Прирост памяти (KiB Python-объектов, KiB RSS), пока собранные приложения живы."""
+        gc.collect()
+        rss_before = current_rss_bytes()
+        tracemalloc.start()
+        applications = build()
+        gc.collect()
+        python_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_bytes = current_rss_bytes() - rss_before
+        del applications
+        gc.collect()
+        return python_bytes / 1024, rss_bytes / 1024
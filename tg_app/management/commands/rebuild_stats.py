@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from tg_app.stats import rebuild_ticket_stats, recompute_ticket_stats, stats_watermark, stored_ticket_stats
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает TicketDailyStat по таблице заявок. С --check только сравнивает. '
+            'Дни, за которые заявки могли уйти в архив, не пересчитываются: их строки хранят '
+            'счётчики удалённых заявок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Сравнить без перезаписи')
+        parser.add_argument('--since', type=parse_date,
+                            help='Первый пересчитываемый день (YYYY-MM-DD). По умолчанию — день '
+                                 'после отсечки ARCHIVE_AFTER_DAYS. Более ранний день сотрёт '
+                                 'статистику заархивированных заявок.')
+
+    def handle(self, *args, **options):
+        since = options['since'] or stats_watermark()
+        if not options['check']:
+            rows = rebuild_ticket_stats(since)
+            self.stdout.write(f'Статистика с {since:%d.%m.%Y} пересчитана, строк: {rows}')
+            return
+
+        expected = recompute_ticket_stats(since)
+        stored = stored_ticket_stats(since)
+        mismatches = sorted(
+            (key, expected.get(key), stored.get(key))
+            for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        )
+        for key, recomputed, actual in mismatches:
+            self.stdout.write(f'{key}: пересчёт {recomputed}, в таблице {actual}')
+        if mismatches:
+            raise CommandError(f'Расхождений: {len(mismatches)}')
+        self.stdout.write(f'Статистика с {since:%d.%m.%Y} совпадает с пересчётом, строк: {len(stored)}')
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tg_app.archive import find_archived_ticket, restore_ticket
+from tg_app.models import BotTenant, Ticket
+
+
+class Command(BaseCommand):
+    help = 'Восстанавливает заявку из архива по её номеру'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ticket_id')
+        parser.add_argument('--archive-dir', default=settings.ARCHIVE_DIR)
+        parser.add_argument('--tenant', help='Восстановить заявку в другого бота (по имени), если её бот удалён')
+
+    def handle(self, *args, **options):
+        ticket_id = options['ticket_id'].lstrip('#')
+        if Ticket.objects.filter(ticket_id=ticket_id).exists():
+            raise CommandError(f'Заявка #{ticket_id} уже есть в базе')
+
+        record = find_archived_ticket(options['archive_dir'], ticket_id)
+        if record is None:
+            raise CommandError(f'Заявка #{ticket_id} не найдена в архиве {options["archive_dir"]}')
+
+        if options['tenant']:
+            tenant = BotTenant.objects.filter(name=options['tenant']).first()
+            if tenant is None:
+                raise CommandError(f'Бот {options["tenant"]} не найден')
+            record['tenant_id'] = tenant.pk
+        tenant_id = record.get('tenant_id')
+        if tenant_id is not None and not BotTenant.objects.filter(pk=tenant_id).exists():
+            # После архивации PROTECT уже не защищает бота заявки от удаления
+            raise CommandError(
+                f'Бот #{tenant_id}, к которому относилась заявка #{ticket_id}, удалён. '
+                f'Укажите другого бота через --tenant'
+            )
+
+        ticket = restore_ticket(record, options['archive_dir'])
+        self.stdout.write(f'Заявка #{ticket.ticket_id} восстановлена')
@@ -0,0 +1,91 @@
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from telegram import Chat, Message, Update, User
+from telegram.ext import CallbackContext
+
+from tg_app.faq import FAQ_ENTRIES
+from tg_app.telegram_bot import TICKET_DATA_KEYS, build_applications, release_conversation, track_user_data
+from tg_app.tenants import TenantConfig
+from tg_app.userdata import current_rss_bytes, payload_size
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочная проверка памяти: имитирует брошенные диалоги со скриншотами через '
+            'track_user_data и обработку таймаута бота и проверяет, что память диалогов ограничена')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=100_000)
+        parser.add_argument('--screenshot-kb', type=int, default=100)
+        # По умолчанию ожидающих таймаута диалогов больше, чем помещается в общий лимит,
+        # чтобы проверялось и вытеснение
+        parser.add_argument('--active', type=int, default=4000,
+                            help='Сколько диалогов одновременно ждут таймаута')
+        parser.add_argument('--total-mb', type=int, default=settings.USER_DATA_TOTAL_MAX_BYTES // 1024 // 1024)
+        parser.add_argument('--max-growth-mb', type=float, default=32,
+                            help='Допустимый рост RSS после прогрева')
+
+    def handle(self, *args, **options):
+        # Настоящее приложение бота с фиктивным токеном: к Bot API никто не обращается
+        tenant = TenantConfig(None, 'soak', f'1:{"A" * 35}', '-1', tuple(FAQ_ENTRIES))
+        application = build_applications([tenant])[0]
+        budget = application.bot_data['user_data_budget']
+        budget.total_limit = options['total_mb'] * 1024 * 1024
+        # Сообщение о каждом вытеснении заглушило бы вывод команды
+        logging.getLogger('tg_app.telegram_bot').setLevel(logging.WARNING)
+
+        waiting = deque()
+        screenshot_size = options['screenshot_kb'] * 1024
+        report_every = max(options['conversations'] // 10, 1)
+        # Прогрев заканчивается, когда очередь таймаутов заполнена и память диалогов вышла на плато
+        warmup = min(max(report_every, options['active']), options['conversations'])
+        warm_rss = None
+        max_total = 0
+
+        for user_id in range(options['conversations']):
+            update, context = self.update_for(application, user_id)
+            # Те же данные, что собирают ask_description и ask_screenshot
+            context.user_data['selected_page'] = 'Бюджет'
+            context.user_data['user_profile_id'] = user_id
+            context.user_data['description'] = 'Не сохраняется бюджет после редактирования категории расходов' * 5
+            track_user_data(update, context)
+            context.user_data['screenshot'] = {'file_name': f'{user_id}.jpg', 'file_data': os.urandom(screenshot_size)}
+            track_user_data(update, context)
+            waiting.append(user_id)
+
+            # Самые старые диалоги дожидаются conversation_timeout
+            while len(waiting) > options['active']:
+                release_conversation(*self.update_for(application, waiting.popleft()), TICKET_DATA_KEYS)
+
+            if user_id % 100 == 0:
+                max_total = max(max_total, sum(payload_size(data) for data in application.user_data.values()))
+            if user_id + 1 == warmup:
+                warm_rss = current_rss_bytes()
+            if (user_id + 1) % report_every == 0:
+                self.stdout.write(
+                    f'{user_id + 1:>8} диалогов: {budget.as_text()}, словарей user_data {len(application.user_data)}'
+                )
+
+        growth_mb = (current_rss_bytes() - warm_rss) / 1024 / 1024
+        self.stdout.write(
+            f'Рост RSS после прогрева: {growth_mb:.1f} МБ, '
+            f'максимум данных диалогов {max_total / 1024 / 1024:.1f} МБ, вытеснено {budget.evicted}'
+        )
+        if max_total > budget.total_limit + budget.per_user_limit:
+            raise CommandError(f'Данные диалогов заняли {max_total / 1024 / 1024:.1f} МБ сверх общего лимита')
+        if len(application.user_data) > options['active']:
+            raise CommandError(f'В памяти осталось {len(application.user_data)} словарей user_data')
+        if growth_mb > options['max_growth_mb']:
+            raise CommandError(f'RSS вырос на {growth_mb:.1f} МБ, допустимо {options["max_growth_mb"]} МБ')
+
+    @staticmethod
+    def update_for(application, user_id):
+        """Update с сообщением пользователя и контекст, как их получает обработчик бота."""
+        user = User(user_id, 'soak', False)
+        message = Message(1, datetime.now(timezone.utc), Chat(user_id, Chat.PRIVATE), from_user=user)
+        update = Update(user_id, message=message)
+        return update, CallbackContext.from_update(update, application)
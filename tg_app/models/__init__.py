@@ -1,4 +1,9 @@
 from .attachment import Attachment
 from .base import BaseModel
+from .bottenant import BotTenant
+from .faqarticle import FaqArticle
+from .page import Page
+from .section import Section
 from .ticket import Ticket
-from .userprofile import UserProfile
\ No newline at end of file
+from .ticketdailystat import TicketDailyStat
+from .userprofile import UserProfile
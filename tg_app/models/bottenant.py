@@ -0,0 +1,14 @@
+from django.db import models
+
+from .base import BaseModel
+
+
+class BotTenant(BaseModel):
+    """Бот, который обслуживает процесс runbot: токен, чат поддержки, свои FAQ и страницы."""
+    name = models.CharField(max_length=100, unique=True)
+    token = models.CharField(max_length=100, unique=True)
+    support_chat_id = models.CharField(max_length=32)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,17 @@
+from django.db import models
+
+from .base import BaseModel
+from .bottenant import BotTenant
+
+
+class FaqArticle(BaseModel):
+    tenant = models.ForeignKey(BotTenant, on_delete=models.CASCADE, related_name='faq_articles')
+    question = models.CharField(max_length=255)
+    answer = models.TextField()
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('position', 'id')
+
+    def __str__(self):
+        return self.question
@@ -0,0 +1,22 @@
+from django.db import models
+from django.db.models import Q
+
+from .base import BaseModel
+from .bottenant import BotTenant
+
+
+class Page(BaseModel):
+    # Страницы без бота общие: ими пользуются боты, у которых нет своих страниц
+    tenant = models.ForeignKey(BotTenant, on_delete=models.CASCADE, null=True, blank=True, related_name='pages')
+    name = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('position', 'id')
+        constraints = [
+            models.UniqueConstraint(fields=('tenant', 'name'), name='unique_page_per_tenant'),
+            models.UniqueConstraint(fields=('name',), condition=Q(tenant__isnull=True), name='unique_shared_page'),
+        ]
+
+    def __str__(self):
+        return self.name
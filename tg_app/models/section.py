@@ -0,0 +1,19 @@
+from django.db import models
+
+from .base import BaseModel
+from .page import Page
+
+
+class Section(BaseModel):
+    page = models.ForeignKey(Page, on_delete=models.CASCADE, related_name='sections')
+    name = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('position', 'id')
+        constraints = [
+            models.UniqueConstraint(fields=('page', 'name'), name='unique_section_per_page'),
+        ]
+
+    def __str__(self):
+        return f'{self.page.name} / {self.name}'
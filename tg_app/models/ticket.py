@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 
 from django.utils import timezone
 
 from .base import BaseModel
+from .bottenant import BotTenant
+from .ticketdailystat import TicketDailyStat
 from .userprofile import UserProfile
 
 
@@ -13,8 +15,12 @@ class Ticket(BaseModel):
         ('resolved', 'Решена'),
         ('closed', 'Закрыта'),
     ]
+    RESOLVED_STATUSES = ('resolved', 'closed')
+    STAT_FIELDS = {'created_at', 'tenant', 'page', 'section', 'is_suggestion', 'status', 'resolved_at'}
 
     ticket_id = models.CharField(max_length=8, unique=True, editable=False)
+    # Бот, через который пришла заявка; пусто — бот из настроек (TELEGRAM_BOT_TOKEN)
+    tenant = models.ForeignKey(BotTenant, on_delete=models.PROTECT, null=True, blank=True, related_name='tickets')
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='tickets')
     description = models.TextField()
     additional_info = models.TextField(null=True, blank=True)
@@ -23,12 +29,62 @@ class Ticket(BaseModel):
     page = models.CharField(max_length=100, null=True, blank=True)
     section = models.CharField(max_length=100, null=True, blank=True)
     is_suggestion = models.BooleanField(default=False)
-    
+    resolved_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Сообщение о заявке в чате поддержки, в ответ на него пересылаются дополнения пользователя
+    support_message_id = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Выборка заявок для архивации по статусу и давности изменения
+            models.Index(fields=['status', 'updated_at'], name='ticket_status_updated_idx'),
+            # История заявок пользователя в /mytickets одного бота: keyset-пагинация по (created_at, id)
+            models.Index(fields=['user', 'tenant', 'created_at', 'id'], name='ticket_user_tenant_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем, в какой строке статистики учтена заявка, чтобы при сохранении перенести её
+        if not cls.STAT_FIELDS & instance.get_deferred_fields():
+            instance._stat_row = instance.stat_row()
+        return instance
+
+    def stat_row(self):
+        """Ключ строки TicketDailyStat и время решения заявки в секундах."""
+        key = (
+            timezone.localdate(self.created_at),
+            self.tenant_id or 0,  # TicketDailyStat.tenant_key
+            self.page or '',
+            self.section or '',
+            self.is_suggestion,
+            self.status,
+        )
+        resolution = int((self.resolved_at - self.created_at).total_seconds()) if self.resolved_at else 0
+        return key, resolution
+
     def save(self, *args, **kwargs):
         if not self.ticket_id:
             from uuid import uuid4
             self.ticket_id = str(uuid4())[:8]
-        super().save(*args, **kwargs)
+
+        if self.status not in self.RESOLVED_STATUSES:
+            self.resolved_at = None
+        elif self.resolved_at is None:
+            self.resolved_at = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'resolved_at'}
+
+        new_row = self.stat_row()
+        with transaction.atomic():
+            if self._state.adding:
+                old_row = None
+            elif hasattr(self, '_stat_row'):
+                old_row = self._stat_row
+            else:
+                old_row = Ticket.objects.get(pk=self.pk).stat_row()
+            super().save(*args, **kwargs)
+            TicketDailyStat.apply_change(old_row, new_row)
+        self._stat_row = new_row
 
     def __str__(self):
         return f'Ticket #{self.ticket_id} from {self.user}'
@@ -0,0 +1,54 @@
+from django.db import models
+from django.db.models import F
+
+
+class TicketDailyStat(models.Model):
+    """Счётчики заявок за день по боту, странице, вкладке, типу и статусу.
+
+    Обновляются инкрементально из Ticket.save(), поэтому статистика читается
+    из небольшой таблицы, а не группировкой по всем заявкам.
+    """
+    day = models.DateField()
+    # id BotTenant без внешнего ключа, чтобы ключ строки не содержал NULL (уникальность
+    # на PostgreSQL 14 не распространяется на NULL): 0 — бот из настроек, как '' для страницы
+    tenant_key = models.IntegerField(default=0)
+    page = models.CharField(max_length=100, blank=True, default='')
+    section = models.CharField(max_length=100, blank=True, default='')
+    is_suggestion = models.BooleanField(default=False)
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+    # Сумма времени решения (в секундах) по заявкам в статусах "Решена"/"Закрыта"
+    resolution_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('day', 'tenant_key', 'page', 'section', 'is_suggestion', 'status'),
+                name='unique_ticket_daily_stat',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.page}/{self.section} {self.status}: {self.count}'
+
+    @classmethod
+    def apply(cls, key, count, resolution_seconds):
+        """Прибавляет `count` и `resolution_seconds` к строке с ключом `key`."""
+        day, tenant_key, page, section, is_suggestion, status = key
+        row, _ = cls.objects.get_or_create(
+            day=day, tenant_key=tenant_key, page=page, section=section, is_suggestion=is_suggestion, status=status
+        )
+        cls.objects.filter(pk=row.pk).update(
+            count=F('count') + count,
+            resolution_seconds=F('resolution_seconds') + resolution_seconds,
+        )
+
+    @classmethod
+    def apply_change(cls, old, new):
+        """Переносит заявку из строки `old` в строку `new`; каждая — пара (ключ, время решения)."""
+        if old == new:
+            return
+        if old is not None:
+            cls.apply(old[0], -1, -old[1])
+        if new is not None:
+            cls.apply(new[0], 1, new[1])
@@ -0,0 +1,97 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from tg_app.models import Ticket, TicketDailyStat
+
+
+def stats_watermark():
+    """Первый день, за который в базе не может быть заархивированных заявок.
+
+    Архивируются заявки, не изменявшиеся ARCHIVE_AFTER_DAYS дней, а заявка меняется не раньше,
+    чем создана. Поэтому заявки, созданные после дня отсечки, ещё все в базе. Более ранние дни
+    TicketDailyStat хранит и за удалённые архивацией заявки, и пересчитать их нельзя.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    return timezone.localdate(cutoff) + timedelta(days=1)
+
+
+def recompute_ticket_stats(since=None):
+    """Полный пересчёт статистики по таблице заявок: {ключ строки: [count, resolution_seconds]}.
+
+    С `since` учитываются только заявки, созданные начиная с этого дня.
+    """
+    totals = defaultdict(lambda: [0, 0])
+    tickets = Ticket.objects.only(*Ticket.STAT_FIELDS)
+    if since is not None:
+        tickets = tickets.filter(created_at__date__gte=since)
+    for ticket in tickets.iterator(chunk_size=2000):
+        key, resolution = ticket.stat_row()
+        totals[key][0] += 1
+        totals[key][1] += resolution
+    return dict(totals)
+
+
+def stored_ticket_stats(since=None):
+    """Текущее содержимое TicketDailyStat в том же виде, что и recompute_ticket_stats()."""
+    rows = TicketDailyStat.objects.exclude(count=0, resolution_seconds=0)
+    if since is not None:
+        rows = rows.filter(day__gte=since)
+    return {
+        (row.day, row.tenant_key, row.page, row.section, row.is_suggestion, row.status):
+            [row.count, row.resolution_seconds]
+        for row in rows
+    }
+
+
+@transaction.atomic
+def rebuild_ticket_stats(since):
+    """Заменяет строки TicketDailyStat начиная с дня `since` результатом пересчёта.
+
+    Более ранние строки не трогаются: в них учтены заархивированные заявки.
+    """
+    totals = recompute_ticket_stats(since)
+    TicketDailyStat.objects.filter(day__gte=since).delete()
+    TicketDailyStat.objects.bulk_create([
+        TicketDailyStat(
+            day=day, tenant_key=tenant_key, page=page, section=section, is_suggestion=is_suggestion,
+            status=status, count=count, resolution_seconds=resolution,
+        )
+        for (day, tenant_key, page, section, is_suggestion, status), (count, resolution) in totals.items()
+    ], batch_size=1000)
+    return len(totals)
+
+
+def stats_summary(days, tenant_key=0):
+    """Текстовая сводка по заявкам и предложениям бота за последние `days` дней.
+
+    `tenant_key` — id BotTenant или 0 для бота из настроек.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = TicketDailyStat.objects.filter(day__gte=since, tenant_key=tenant_key)
+
+    status_names = dict(Ticket.STATUS_CHOICES)
+    lines = [f"Статистика с {since:%d.%m.%Y}:"]
+    for is_suggestion, title in ((False, "Заявки"), (True, "Предложения")):
+        by_status = rows.filter(is_suggestion=is_suggestion).values('status').annotate(total=Sum('count'))
+        counts = {row['status']: row['total'] for row in by_status if row['total']}
+        lines.append(f"{title}: {sum(counts.values())}")
+        lines.extend(f"  {status_names.get(status, status)}: {total}" for status, total in sorted(counts.items()))
+
+    resolved = rows.filter(status__in=Ticket.RESOLVED_STATUSES, is_suggestion=False).aggregate(
+        count=Sum('count'), seconds=Sum('resolution_seconds')
+    )
+    if resolved['count']:
+        lines.append(f"Среднее время решения: {timedelta(seconds=resolved['seconds'] // resolved['count'])}")
+
+    top_pages = (
+        rows.values('page').annotate(total=Sum('count')).filter(total__gt=0).order_by('-total')[:5]
+    )
+    if top_pages:
+        lines.append("Страницы:")
+        lines.extend(f"  {row['page'] or 'Не указана'}: {row['total']}" for row in top_pages)
+    return "\n".join(lines)
@@ -1,14 +1,20 @@
 # bot.py
 import asyncio
+import functools
 import logging
 import os
+import signal
+import warnings
 import django
 from uuid import uuid4
 from io import BytesIO
 import base64
 from html import escape
-from asgiref.sync import sync_to_async
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, Bot
+from tempfile import NamedTemporaryFile
+from telegram import (
+    Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, Bot,
+    InlineKeyboardButton, InlineKeyboardMarkup, ReplyParameters,
+)
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -16,14 +22,32 @@ from telegram.ext import (
     ContextTypes,
     filters,
     ConversationHandler, Application,
+    ApplicationHandlerStop,
+    CallbackQueryHandler,
+    TypeHandler,
 )
-from telegram.error import ChatMigrated
-from django.conf import settings
-from tg_app.models import UserProfile, Ticket, Attachment
+from telegram.error import ChatMigrated, InvalidToken
+from telegram.warnings import PTBUserWarning
+from django.apps import apps
 
-# Инициализация Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ProjectTG.settings')
-django.setup()
+# Инициализация Django. Команда runbot уже вызвала django.setup(),
+# повторная инициализация нужна только при запуске модуля напрямую.
+if not apps.ready:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ProjectTG.settings')
+    django.setup()
+
+from django.conf import settings
+from django.utils import timezone
+from tg_app.bot_api import build_requests
+from tg_app.catalog import CANCEL_KEYBOARD, CatalogCache
+from tg_app.db import database_sync_to_async
+from tg_app.faq import FaqMetrics
+from tg_app.history import add_follow_up, get_user_ticket, ticket_page
+from tg_app.models import BotTenant, UserProfile, Ticket, Attachment
+from tg_app.stats import stats_summary
+from tg_app.tenants import FaqCache, load_tenants
+from tg_app.throttle import FloodGuard
+from tg_app.userdata import UserDataBudget, payload_size
 
 # Настройка логирования
 logging.basicConfig(
@@ -33,30 +57,32 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Состояния для диалогов
-ASK_PAGE, ASK_DESCRIPTION, ASK_SCREENSHOT, ASK_ADDITIONAL_INFO = range(4)
+ASK_PAGE, ASK_DESCRIPTION, ASK_SCREENSHOT, ASK_ADDITIONAL_INFO, ASK_FAQ_FEEDBACK = range(5)
 # Новые состояния для диалога предложений
 SUGGESTION_PAGE, SUGGESTION_SECTION, SUGGESTION_TEXT = range(10, 13)
-
-# Текст справки и FAQ
-FAQ_TEXT = """
-
-Убедитесь, что у вас установлена последняя версия приложения в App Store/Google Play Market.
-
-1. Как завести бюджет в приложении?
-Ответ: Для добавления бюджета, нажмите на раздел “Бюджеты” и выберите “Создать новый бюджет”. Заполните название, категории расходов и планируемую сумму. Нажмите “Сохранить” для сохранения.
-
-2. Как отслеживать долги в приложении?
-Ответ: В разделе “Долги” нажмите на “Добавить новый долг”. Укажите сумму долга, дату выплаты и контакт для связи. При выплате обновляйте статус долга, чтобы видеть прогресс.
-
-3. Как работает кредитный калькулятор?
-Ответ: Выберите раздел “Кредитный калькулятор”. Введите сумму кредита, процентную ставку и срок в месяцах. Кликните на “Рассчитать”, чтобы получить ежемесячные платежи и итоговую сумму.
-
-4. Как добавить инвестиции в приложение?
-Ответ: Перейдите в раздел “Инвестиции” и нажмите “Добавить инвестицию”. Укажите тип инвестиции, сумму и срок вложения. Приложение автоматически рассчитает прогнозируемый доход.
-
-5. Можно ли настроить уведомления о финансовых событиях?
-Ответ: Да, в разделе “Настройки” выберите “Уведомления” и настройте оповещения о запланированных выплатах, изменениях бюджета и инвестициях.
-"""
+# Состояние диалога дополнения к заявке из /mytickets
+FOLLOWUP_MESSAGE = 20
+
+# Ключи user_data каждого диалога. По таймауту очищаются только данные завершившегося диалога,
+# чтобы не задеть другой, ещё активный диалог того же пользователя.
+TICKET_DATA_KEYS = ('selected_page', 'user_profile_id', 'description', 'screenshot')
+SUGGESTION_DATA_KEYS = ('selected_page', 'selected_section', 'suggestion_text')
+DIALOG_DATA_KEYS = TICKET_DATA_KEYS + SUGGESTION_DATA_KEYS
+FOLLOWUP_DATA_KEYS = ('followup_ticket_id',)
+
+# Кнопки ответа на предложенную статью FAQ
+FAQ_SOLVED = "Это решило проблему"
+FAQ_NEED_HELP = "Всё ещё нужна помощь"
+
+# Клавиатуры не зависят от пользователя, поэтому собираются один раз
+FAQ_FEEDBACK_KEYBOARD = ReplyKeyboardMarkup(
+    [[KeyboardButton(FAQ_SOLVED)], [KeyboardButton(FAQ_NEED_HELP)], [KeyboardButton("Отмена")]],
+    resize_keyboard=True, one_time_keyboard=True
+)
+SCREENSHOT_KEYBOARD = ReplyKeyboardMarkup(
+    [[KeyboardButton("Нет"), KeyboardButton("Отмена")]],
+    resize_keyboard=True, one_time_keyboard=True
+)
 
 HELP_TEXT = """
 
@@ -65,34 +91,100 @@ HELP_TEXT = """
 1. Сообщить о возникшей проблеме через команду /start.
 2. Предложить улучшения приложения через команду /suggestions.
 3. Приложить скриншоты или фото для лучшего описания ситуации.
-4. Получить ответ от нашей команды поддержки.
+4. Посмотреть свои обращения и дополнить открытые через команду /mytickets.
+5. Получить ответ от нашей команды поддержки.
 """
 
+async def flood_guard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Отбрасывает обновления сверх лимита до того, как их обработают диалоги и база."""
+    requeued = context.bot_data['requeued_updates']
+    if update.update_id in requeued:
+        # Команда, возвращённая в очередь interrupt_followup, уже прошла проверку
+        requeued.discard(update.update_id)
+        return
+    user = update.effective_user
+    allowed, first_rejection = context.bot_data['flood_guard'].allow(user.id if user else None)
+    if allowed:
+        return
+    if first_rejection and update.message:
+        await update.message.reply_text("Слишком много сообщений. Пожалуйста, подождите немного.")
+    elif first_rejection and update.callback_query:
+        # Без ответа кнопка продолжает показывать индикатор загрузки
+        await update.callback_query.answer("Слишком много запросов. Пожалуйста, подождите немного.")
+    raise ApplicationHandlerStop
+
+def track_user_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Учитывает объём данных диалога и вытесняет самые старые диалоги при превышении общего лимита.
+
+    Лимит общий для всех ботов процесса, поэтому диалог учитывается вместе с приложением,
+    из которого его нужно вытеснить.
+    """
+    budget = context.bot_data['user_data_budget']
+    key = (context.application, update.effective_user.id)
+    for application, user_id in budget.update(key, payload_size(context.user_data)):
+        application.drop_user_data(user_id)
+        logger.info("Данные незавершённого диалога пользователя %s вытеснены из памяти", user_id)
+
+def clear_user_data(update: Update, context: ContextTypes.DEFAULT_TYPE, keys) -> None:
+    """Удаляет из user_data ключи диалога `keys` и обновляет учёт оставшихся данных."""
+    for key in keys:
+        context.user_data.pop(key, None)
+    if context.user_data:
+        track_user_data(update, context)
+    else:
+        context.bot_data['user_data_budget'].release((context.application, update.effective_user.id))
+
+def is_support_chat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    return str(update.effective_chat.id) == str(context.bot_data['support_chat_id'])
+
+async def migrate_support_chat(context: ContextTypes.DEFAULT_TYPE, new_chat_id: int) -> None:
+    """Запоминает новый id чата поддержки после преобразования группы в супергруппу."""
+    context.bot_data['support_chat_id'] = new_chat_id
+    tenant_id = context.bot_data['tenant_id']
+    if tenant_id is None:
+        settings.SUPPORT_CHAT_ID = new_chat_id
+    else:
+        await database_sync_to_async(
+            BotTenant.objects.filter(pk=tenant_id).update, idempotent=True
+        )(support_chat_id=str(new_chat_id))
+
+def release_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE, keys) -> None:
+    """Освобождает память брошенного диалога: его данные и опустевший словарь user_data."""
+    clear_user_data(update, context, keys)
+    if not context.user_data:
+        context.application.drop_user_data(update.effective_user.id)
+
+async def conversation_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE, keys) -> None:
+    """Завершает брошенный диалог: очищает его данные и сообщает пользователю."""
+    release_conversation(update, context, keys)
+    try:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="Диалог завершён из-за отсутствия активности. Чтобы начать заново, нажмите /start или /suggestions.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при отправке сообщения о завершении диалога: {e}")
+
 async def log_chat_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.message.chat.id
     print(f"Chat ID: {chat_id}")
     await update.message.reply_text(f"Ваш Chat ID: {chat_id}")
 
-# Функция для тестирования
-async def send_test_message(chat_id: str, message: str):
-    bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    await bot.send_message(chat_id='550727902', text=message)
+# Функция для тестирования. Использует уже инициализированного бота приложения,
+# чтобы не создавать отдельный пул соединений на каждый вызов.
+async def send_test_message(bot: Bot, chat_id: str, message: str):
+    await bot.send_message(chat_id=chat_id, text=message)
 
 # Обработчик команды /start
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Приветствие пользователя и запрос страницы с проблемой."""
-    await update.message.reply_text(FAQ_TEXT)
+    await update.message.reply_text(context.bot_data['faq_text'])
 
-    keyboard = [
-        [KeyboardButton("Бюджет"), KeyboardButton("Профиль")],
-        [KeyboardButton("Лента"), KeyboardButton("Инвестиции")],
-        [KeyboardButton("Долги"), KeyboardButton("Другое")],
-        [KeyboardButton("Отмена")]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+    catalog = await context.bot_data['catalog_cache'].get()
     await update.message.reply_text(
         "Здравствуйте! Выберите, на какой странице приложения возникла ошибка.",
-        reply_markup=reply_markup
+        reply_markup=catalog.pages_keyboard
     )
     return ASK_PAGE
 
@@ -106,7 +198,16 @@ async def ask_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return await handle_command_during_conversation(update, context)
 
     selected_page = update.message.text
+    catalog = await context.bot_data['catalog_cache'].get()
+    if not catalog.has_page(selected_page):
+        await update.message.reply_text(
+            "Пожалуйста, выберите страницу из списка.",
+            reply_markup=catalog.pages_keyboard
+        )
+        return ASK_PAGE
+
     context.user_data['selected_page'] = selected_page
+    track_user_data(update, context)
     await update.message.reply_text(
         f"Вы выбрали страницу: {selected_page}. Пожалуйста, опишите вашу проблему подробно.",
         reply_markup=ReplyKeyboardRemove()
@@ -132,7 +233,7 @@ async def ask_description(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return ASK_DESCRIPTION
 
     # Получение или создание профиля пользователя
-    user_profile, created = await sync_to_async(UserProfile.objects.get_or_create, thread_sensitive=True)(
+    user_profile, created = await database_sync_to_async(UserProfile.objects.get_or_create, idempotent=True)(
         telegram_id=user.id,
         defaults={
             'username': user.username,
@@ -141,17 +242,61 @@ async def ask_description(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         }
     )
 
-    context.user_data['user_profile'] = user_profile
+    # Храним только id профиля, а не ORM-объект: данные диалога живут в памяти до его завершения
+    context.user_data['user_profile_id'] = user_profile.pk
     context.user_data['description'] = user_response
+    track_user_data(update, context)
     logger.info("Проблема от %s: %s", user.first_name, user_response)
 
-    keyboard = [[KeyboardButton("Нет"), KeyboardButton("Отмена")]]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+    # Прежде чем создавать заявку, проверяем, нет ли ответа в FAQ
+    faq_metrics = context.bot_data['faq_metrics']
+    faq_metrics.lookups += 1
+    faq_entry = context.bot_data['faq_index'].best_match(user_response, settings.FAQ_MATCH_MIN_SCORE)
+    if faq_entry:
+        faq_metrics.offered += 1
+        await update.message.reply_text(
+            f"Возможно, это поможет:\n\n{faq_entry.question}\n{faq_entry.answer}",
+            reply_markup=FAQ_FEEDBACK_KEYBOARD
+        )
+        return ASK_FAQ_FEEDBACK
+
+    return await request_screenshot(update)
+
+
+async def ask_faq_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Обрабатывает ответ пользователя на предложенную статью FAQ."""
+    if update.message.text == "Отмена":
+        return await cancel(update, context)
+
+    if update.message.text.startswith('/'):
+        return await handle_command_during_conversation(update, context)
+
+    faq_metrics = context.bot_data['faq_metrics']
+    if update.message.text == FAQ_SOLVED:
+        faq_metrics.deflected += 1
+        await update.message.reply_text(
+            "Рады, что проблема решена! Если понадобится помощь, напишите /start.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        clear_user_data(update, context, TICKET_DATA_KEYS)
+        return ConversationHandler.END
+
+    if update.message.text == FAQ_NEED_HELP:
+        faq_metrics.escalated += 1
+        return await request_screenshot(update)
+
+    await update.message.reply_text(
+        f"Пожалуйста, выберите '{FAQ_SOLVED}' или '{FAQ_NEED_HELP}'."
+    )
+    return ASK_FAQ_FEEDBACK
+
 
+async def request_screenshot(update: Update) -> int:
+    """Запрашивает скриншот проблемы."""
     await update.message.reply_text(
         "Спасибо! Пожалуйста, отправьте скриншот или фото, иллюстрирующее проблему. "
         "Если у вас нет скриншота, нажмите 'Нет' для пропуска.",
-        reply_markup=reply_markup
+        reply_markup=SCREENSHOT_KEYBOARD
     )
     return ASK_SCREENSHOT
 
@@ -159,14 +304,21 @@ async def ask_description(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def ask_screenshot(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Сохраняет скриншот и запрашивает дополнительную информацию."""
     if update.message.photo:
-        # Сохранение фото
-        photo_file = await update.message.photo[-1].get_file()
+        photo = update.message.photo[-1]
+        if not context.bot_data['user_data_budget'].fits(photo.file_size or 0):
+            await update.message.reply_text(
+                "Изображение слишком большое. Отправьте скриншот меньшего размера или нажмите 'Нет' для пропуска."
+            )
+            return ASK_SCREENSHOT
+
+        # Сохранение фото. До создания заявки храним байты, в base64 кодируем только при записи в базу
+        photo_file = await photo.get_file()
         photo_bytes = await photo_file.download_as_bytearray()
-        encoded_photo = base64.b64encode(photo_bytes).decode('utf-8')
         context.user_data['screenshot'] = {
             'file_name': f'{update.message.from_user.id}_{uuid4()}.jpg',
-            'file_data': encoded_photo,
+            'file_data': bytes(photo_bytes),
         }
+        track_user_data(update, context)
         logger.info("Скриншот получен от пользователя %s", update.message.from_user.id)
 
         await update.message.reply_text(
@@ -211,25 +363,33 @@ async def ask_additional_info(update: Update, context: ContextTypes.DEFAULT_TYPE
         return await handle_command_during_conversation(update, context)
 
     user_data = context.user_data
-    user_profile = user_data['user_profile']
+    if 'description' not in user_data:
+        # Данные диалога вытеснены из памяти из-за общего лимита
+        await update.message.reply_text(
+            "К сожалению, данные обращения были утеряны. Пожалуйста, начните заново с команды /start.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        clear_user_data(update, context, TICKET_DATA_KEYS)
+        return ConversationHandler.END
+
     additional_info = update.message.text
     description = user_data['description']
 
     # Создание тикета
-    ticket = await sync_to_async(Ticket.objects.create, thread_sensitive=True)(
-        user=user_profile,
+    ticket = await database_sync_to_async(Ticket.objects.create)(
+        user_id=user_data['user_profile_id'],
+        tenant_id=context.bot_data['tenant_id'],
         description=description,
         additional_info=additional_info,
         page=context.user_data.get('selected_page', ''),
     )
-    user_data['ticket'] = ticket
 
     # Сохранение скриншота
     if user_data.get('screenshot'):
-        await sync_to_async(Attachment.objects.create, thread_sensitive=True)(
+        await database_sync_to_async(Attachment.objects.create)(
             ticket=ticket,
             file_name=user_data['screenshot']['file_name'],
-            file_data=user_data['screenshot']['file_data']
+            file_data=base64.b64encode(user_data['screenshot']['file_data']).decode('utf-8')
         )
 
     confirmation_message = (
@@ -243,13 +403,20 @@ async def ask_additional_info(update: Update, context: ContextTypes.DEFAULT_TYPE
     await notify_support_team(context, update, ticket)
 
     # Очистка данных пользователя
-    context.user_data.clear()
+    clear_user_data(update, context, TICKET_DATA_KEYS)
 
     return ConversationHandler.END
 
+async def remember_support_message(ticket: Ticket, message) -> None:
+    """Запоминает сообщение о заявке в чате поддержки, чтобы дополнения приходили ответом на него."""
+    ticket.support_message_id = message.message_id
+    await database_sync_to_async(
+        Ticket.objects.filter(pk=ticket.pk).update, idempotent=True
+    )(support_message_id=message.message_id)
+
 async def notify_support_team(context: ContextTypes.DEFAULT_TYPE, update: Update, ticket: Ticket):
     """Отправляет информацию о проблеме в чат поддержки."""
-    support_chat_id = settings.SUPPORT_CHAT_ID
+    support_chat_id = context.bot_data['support_chat_id']
     selected_page = ticket.page or 'Неизвестно'
     message = (
         f"Новая заявка #{ticket.ticket_id}\n"
@@ -259,29 +426,29 @@ async def notify_support_team(context: ContextTypes.DEFAULT_TYPE, update: Update
         f"<b>Дополнительная информация:</b>\n{escape(ticket.additional_info)}"
     )
 
-    has_attachments = await sync_to_async(ticket.attachments.exists, thread_sensitive=True)()
+    has_attachments = await database_sync_to_async(ticket.attachments.exists, idempotent=True)()
     try:
         if has_attachments:
-            attachment = await sync_to_async(ticket.attachments.first, thread_sensitive=True)()
+            attachment = await database_sync_to_async(ticket.attachments.first, idempotent=True)()
             photo_bytes = base64.b64decode(attachment.file_data)
             photo_file = BytesIO(photo_bytes)
             photo_file.name = attachment.file_name
 
-            await context.bot.send_photo(
+            sent = await context.bot.send_photo(
                 chat_id=support_chat_id,
                 photo=photo_file,
                 caption=message,
                 parse_mode='HTML'
             )
         else:
-            await context.bot.send_message(
+            sent = await context.bot.send_message(
                 chat_id=support_chat_id,
                 text=message,
                 parse_mode='HTML'
             )
+        await remember_support_message(ticket, sent)
     except ChatMigrated as e:
-        new_chat_id = e.new_chat_id
-        settings.SUPPORT_CHAT_ID = new_chat_id
+        await migrate_support_chat(context, e.new_chat_id)
     except Exception as e:
         logger.error(f"Ошибка при отправке сообщения в чат поддержки: {e}")
 
@@ -291,22 +458,16 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         "Вы отменили процесс. Если у вас возникнут вопросы, напишите мне снова.",
         reply_markup=ReplyKeyboardRemove()
     )
-    context.user_data.clear()
+    clear_user_data(update, context, DIALOG_DATA_KEYS)
     return ConversationHandler.END
 
 # Обработчики для диалога предложений
 async def suggestions_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Начинает диалог предложений и запрашивает страницу."""
-    keyboard = [
-        [KeyboardButton("Бюджет"), KeyboardButton("Профиль")],
-        [KeyboardButton("Лента"), KeyboardButton("Инвестиции")],
-        [KeyboardButton("Долги"), KeyboardButton("Другое")],
-        [KeyboardButton("Отмена")]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
+    catalog = await context.bot_data['catalog_cache'].get()
     await update.message.reply_text(
         "Выберите страницу, на которой вы бы хотели видеть улучшение:",
-        reply_markup=reply_markup
+        reply_markup=catalog.pages_keyboard
     )
     return SUGGESTION_PAGE
 
@@ -319,48 +480,26 @@ async def suggestion_page_selected(update: Update, context: ContextTypes.DEFAULT
         return await handle_command_during_conversation(update, context)
 
     selected_page = update.message.text
-    context.user_data['selected_page'] = selected_page
-
-    if selected_page == "Бюджет":
-        keyboard = [
-            [KeyboardButton("Расходы"), KeyboardButton("Доходы")],
-            [KeyboardButton("Счета"), KeyboardButton("План")],
-            [KeyboardButton("Отмена")]
-        ]
-    elif selected_page == "Долги":
-        keyboard = [
-            [KeyboardButton("Все"), KeyboardButton("Кредиты")],
-            [KeyboardButton("Рассрочки"), KeyboardButton("Мои долги")],
-            [KeyboardButton("Мои должники"), KeyboardButton("Отмена")]
-        ]
-    elif selected_page == "Инвестиции":
-        keyboard = [
-            [KeyboardButton("Все"), KeyboardButton("Депозит")],
-            [KeyboardButton("Фондовый рынок"), KeyboardButton("Краудфандинг")],
-            [KeyboardButton("Долевой бизнес"), KeyboardButton("Криптовалюта")],
-            [KeyboardButton("Отмена")]
-        ]
-    elif selected_page == "Лента":
-        keyboard = [
-            [KeyboardButton("Новости"), KeyboardButton("Kase")],
-            [KeyboardButton("Медиа"), KeyboardButton("Авторы")],
-            [KeyboardButton("Отмена")]
-        ]
-    elif selected_page == "Профиль":
+    catalog = await context.bot_data['catalog_cache'].get()
+    if not catalog.has_page(selected_page):
         await update.message.reply_text(
-            "Пожалуйста, опишите ваше предложение:",
-            reply_markup=ReplyKeyboardMarkup([[KeyboardButton("Отмена")]], resize_keyboard=True, one_time_keyboard=True)
+            "Пожалуйста, выберите страницу из списка.",
+            reply_markup=catalog.pages_keyboard
         )
-        return SUGGESTION_TEXT
-    else:
-        # Если выбрано "Другое" или некорректный ввод
+        return SUGGESTION_PAGE
+
+    context.user_data['selected_page'] = selected_page
+    track_user_data(update, context)
+
+    reply_markup = catalog.section_keyboard(selected_page)
+    if reply_markup is None:
+        # У страницы нет вкладок — сразу запрашиваем текст предложения
         await update.message.reply_text(
             "Пожалуйста, опишите ваше предложение:",
-            reply_markup=ReplyKeyboardMarkup([[KeyboardButton("Отмена")]], resize_keyboard=True, one_time_keyboard=True)
+            reply_markup=CANCEL_KEYBOARD
         )
         return SUGGESTION_TEXT
 
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=True)
     await update.message.reply_text(
         f"Выберите вкладку на странице '{selected_page}', в которой вы бы хотели что-то улучшить:",
         reply_markup=reply_markup
@@ -376,11 +515,40 @@ async def suggestion_section_selected(update: Update, context: ContextTypes.DEFA
         return await handle_command_during_conversation(update, context)
 
     selected_section = update.message.text
+    selected_page = context.user_data.get('selected_page')
+    catalog = await context.bot_data['catalog_cache'].get()
+    if not catalog.has_page(selected_page):
+        # Страницу переименовали в админке или данные диалога вытеснены из памяти
+        context.user_data.pop('selected_page', None)
+        track_user_data(update, context)
+        await update.message.reply_text(
+            "Эта страница больше недоступна. Пожалуйста, выберите страницу из списка.",
+            reply_markup=catalog.pages_keyboard
+        )
+        return SUGGESTION_PAGE
+
+    reply_markup = catalog.section_keyboard(selected_page)
+    if reply_markup is None:
+        # Вкладки страницы удалили, пока пользователь выбирал
+        await update.message.reply_text(
+            "Пожалуйста, опишите ваше предложение:",
+            reply_markup=CANCEL_KEYBOARD
+        )
+        return SUGGESTION_TEXT
+
+    if not catalog.has_section(selected_page, selected_section):
+        await update.message.reply_text(
+            "Пожалуйста, выберите вкладку из списка.",
+            reply_markup=reply_markup
+        )
+        return SUGGESTION_SECTION
+
     context.user_data['selected_section'] = selected_section
+    track_user_data(update, context)
 
     await update.message.reply_text(
         "Пожалуйста, опишите ваше предложение:",
-        reply_markup=ReplyKeyboardMarkup([[KeyboardButton("Отмена")]], resize_keyboard=True, one_time_keyboard=True)
+        reply_markup=CANCEL_KEYBOARD
     )
     return SUGGESTION_TEXT
 
@@ -397,7 +565,7 @@ async def suggestion_text_received(update: Update, context: ContextTypes.DEFAULT
     context.user_data['suggestion_text'] = suggestion_text
 
     # Получение или создание профиля пользователя
-    user_profile, created = await sync_to_async(UserProfile.objects.get_or_create, thread_sensitive=True)(
+    user_profile, created = await database_sync_to_async(UserProfile.objects.get_or_create, idempotent=True)(
         telegram_id=user.id,
         defaults={
             'username': user.username,
@@ -407,8 +575,9 @@ async def suggestion_text_received(update: Update, context: ContextTypes.DEFAULT
     )
 
     # Создание записи предложения в базе данных
-    suggestion = await sync_to_async(Ticket.objects.create, thread_sensitive=True)(
+    suggestion = await database_sync_to_async(Ticket.objects.create)(
         user=user_profile,
+        tenant_id=context.bot_data['tenant_id'],
         description=suggestion_text,
         page=context.user_data.get('selected_page', ''),
         section=context.user_data.get('selected_section', ''),
@@ -431,13 +600,13 @@ async def suggestion_text_received(update: Update, context: ContextTypes.DEFAULT
     )
 
     # Очистка данных пользователя
-    context.user_data.clear()
+    clear_user_data(update, context, SUGGESTION_DATA_KEYS)
 
     return ConversationHandler.END
 
 async def notify_support_team_suggestion(context: ContextTypes.DEFAULT_TYPE, update: Update, suggestion: Ticket, excel_file):
     """Отправляет информацию о предложении в чат поддержки вместе с Excel-файлом."""
-    support_chat_id = settings.SUPPORT_CHAT_ID
+    support_chat_id = context.bot_data['support_chat_id']
     message = (
         f"Новое предложение #{suggestion.ticket_id}\n"
         f"От пользователя: @{escape(update.message.from_user.username)} ({escape(update.message.from_user.first_name)})\n\n"
@@ -448,15 +617,15 @@ async def notify_support_team_suggestion(context: ContextTypes.DEFAULT_TYPE, upd
     )
 
     try:
-        await context.bot.send_document(
+        sent = await context.bot.send_document(
             chat_id=support_chat_id,
             document=excel_file,
             caption=message,
             parse_mode='HTML'
         )
+        await remember_support_message(suggestion, sent)
     except ChatMigrated as e:
-        new_chat_id = e.new_chat_id
-        settings.SUPPORT_CHAT_ID = new_chat_id
+        await migrate_support_chat(context, e.new_chat_id)
     except Exception as e:
         logger.error(f"Ошибка при отправке сообщения в чат поддержки: {e}")
 
@@ -466,12 +635,12 @@ async def cancel_suggestion(update: Update, context: ContextTypes.DEFAULT_TYPE)
         "Вы отменили отправку предложения. Если захотите поделиться идеями, напишите /suggestions.",
         reply_markup=ReplyKeyboardRemove()
     )
-    context.user_data.clear()
+    clear_user_data(update, context, SUGGESTION_DATA_KEYS)
     return ConversationHandler.END
 
 # Вспомогательные функции
 async def get_user_profile(user):
-    user_profile, created = await sync_to_async(UserProfile.objects.get_or_create, thread_sensitive=True)(
+    user_profile, created = await database_sync_to_async(UserProfile.objects.get_or_create, idempotent=True)(
         telegram_id=user.id,
         defaults={
             'username': user.username,
@@ -481,9 +650,6 @@ async def get_user_profile(user):
     )
     return user_profile
 
-import pandas as pd
-from tempfile import NamedTemporaryFile
-
 async def generate_excel_file(suggestion):
     data = {
         'Пользователь': [f'{suggestion.user.first_name} @{suggestion.user.username}'],
@@ -493,6 +659,13 @@ async def generate_excel_file(suggestion):
         'Текст предложения': [suggestion.description],
         'Номер предложения в БД': [suggestion.ticket_id],
     }
+    # pandas нужен только для предложений, поэтому импортируется при первом вызове
+    # и вместе с записью файла выполняется в отдельном потоке, не блокируя бота
+    return await asyncio.to_thread(write_excel_file, data)
+
+def write_excel_file(data):
+    import pandas as pd
+
     df = pd.DataFrame(data)
     temp_file = NamedTemporaryFile(delete=False, suffix='.xlsx')
     df.to_excel(temp_file.name, index=False)
@@ -503,6 +676,219 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Отправляет описание возможностей бота при использовании команды /help."""
     await update.message.reply_text(HELP_TEXT)
 
+def tickets_keyboard(rows, cursor, next_cursor) -> InlineKeyboardMarkup:
+    """Кнопки заявок страницы /mytickets и навигация по страницам."""
+    status_names = dict(Ticket.STATUS_CHOICES)
+    buttons = [
+        [InlineKeyboardButton(
+            f"{'Предложение' if row['is_suggestion'] else 'Заявка'} #{row['ticket_id']} — "
+            f"{status_names.get(row['status'], row['status'])}, {timezone.localtime(row['created_at']):%d.%m.%Y}",
+            callback_data=f"ticket:{row['id']}",
+        )]
+        for row in rows
+    ]
+    navigation = []
+    if cursor:
+        navigation.append(InlineKeyboardButton("« К началу", callback_data="mytickets:"))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton("Дальше »", callback_data=f"mytickets:{next_cursor}"))
+    if navigation:
+        buttons.append(navigation)
+    return InlineKeyboardMarkup(buttons)
+
+async def mytickets_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает первую страницу обращений пользователя."""
+    rows, next_cursor = await database_sync_to_async(ticket_page, idempotent=True)(
+        update.effective_user.id, context.bot_data['tenant_id']
+    )
+    if not rows:
+        await update.message.reply_text("У вас пока нет обращений. Чтобы сообщить о проблеме, нажмите /start.")
+        return
+    await update.message.reply_text("Ваши обращения:", reply_markup=tickets_keyboard(rows, None, next_cursor))
+
+async def mytickets_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Переключает страницу списка обращений по курсору из кнопки."""
+    query = update.callback_query
+    await query.answer()
+    cursor = query.data.partition(':')[2] or None
+    try:
+        rows, next_cursor = await database_sync_to_async(ticket_page, idempotent=True)(
+            update.effective_user.id, context.bot_data['tenant_id'], cursor
+        )
+    except ValueError:
+        return
+    if not rows:
+        await query.edit_message_text("У вас пока нет обращений. Чтобы сообщить о проблеме, нажмите /start.")
+        return
+    await query.edit_message_text("Ваши обращения:", reply_markup=tickets_keyboard(rows, cursor, next_cursor))
+
+async def ticket_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает заявку из списка и, если она открыта, кнопку для дополнения."""
+    query = update.callback_query
+    ticket = await database_sync_to_async(get_user_ticket, idempotent=True)(
+        update.effective_user.id, context.bot_data['tenant_id'], int(query.data.partition(':')[2])
+    )
+    if ticket is None:
+        await query.answer("Обращение не найдено.")
+        return
+    await query.answer()
+
+    text = (
+        f"{'Предложение' if ticket.is_suggestion else 'Заявка'} #{ticket.ticket_id}\n"
+        f"Статус: {ticket.get_status_display()}\n"
+        f"Создано: {timezone.localtime(ticket.created_at):%d.%m.%Y %H:%M}\n"
+        f"Страница: {ticket.page or 'Не указана'}\n\n"
+        # Сообщение Telegram ограничено 4096 символами
+        f"{ticket.description[:3000]}"
+    )
+    buttons = []
+    if ticket.status not in Ticket.RESOLVED_STATUSES:
+        buttons.append([InlineKeyboardButton("Дополнить обращение", callback_data=f"followup:{ticket.pk}")])
+    buttons.append([InlineKeyboardButton("« К списку", callback_data="mytickets:")])
+    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(buttons))
+
+async def followup_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Начинает дополнение открытой заявки текстом или фото."""
+    query = update.callback_query
+    ticket = await database_sync_to_async(get_user_ticket, idempotent=True)(
+        update.effective_user.id, context.bot_data['tenant_id'], int(query.data.partition(':')[2])
+    )
+    if ticket is None or ticket.status in Ticket.RESOLVED_STATUSES:
+        await query.answer("Обращение не найдено или уже закрыто.")
+        return ConversationHandler.END
+    await query.answer()
+
+    context.user_data['followup_ticket_id'] = ticket.pk
+    track_user_data(update, context)
+    await query.message.reply_text(
+        f"Отправьте текст или фото, которые нужно добавить к обращению #{ticket.ticket_id}.",
+        reply_markup=CANCEL_KEYBOARD
+    )
+    return FOLLOWUP_MESSAGE
+
+async def receive_followup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Сохраняет дополнение к заявке и пересылает его в чат поддержки."""
+    ticket_pk = context.user_data.get('followup_ticket_id')
+    clear_user_data(update, context, FOLLOWUP_DATA_KEYS)
+    if ticket_pk is None:
+        # Данные диалога вытеснены из памяти из-за общего лимита
+        await update.message.reply_text(
+            "Не удалось определить обращение для дополнения. Откройте /mytickets и выберите его снова.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return ConversationHandler.END
+
+    ticket = await database_sync_to_async(get_user_ticket, idempotent=True)(
+        update.effective_user.id, context.bot_data['tenant_id'], ticket_pk
+    )
+    if ticket is None or ticket.status in Ticket.RESOLVED_STATUSES:
+        await update.message.reply_text(
+            "Это обращение уже закрыто. Чтобы сообщить о новой проблеме, нажмите /start.",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return ConversationHandler.END
+
+    if update.message.photo:
+        photo = update.message.photo[-1]
+        if not context.bot_data['user_data_budget'].fits(photo.file_size or 0):
+            context.user_data['followup_ticket_id'] = ticket_pk
+            track_user_data(update, context)
+            await update.message.reply_text("Изображение слишком большое. Отправьте фото меньшего размера.")
+            return FOLLOWUP_MESSAGE
+        photo_file = await photo.get_file()
+        photo_bytes = await photo_file.download_as_bytearray()
+        await database_sync_to_async(Attachment.objects.create)(
+            ticket=ticket,
+            file_name=f'{update.message.from_user.id}_{uuid4()}.jpg',
+            file_data=base64.b64encode(photo_bytes).decode('utf-8')
+        )
+        text = update.message.caption or "[фото]"
+    else:
+        text = update.message.text
+
+    await database_sync_to_async(add_follow_up)(ticket.pk, text)
+    await forward_followup(context, update, ticket)
+    await update.message.reply_text(
+        f"Спасибо! Дополнение к обращению #{ticket.ticket_id} передано в поддержку.",
+        reply_markup=ReplyKeyboardRemove()
+    )
+    return ConversationHandler.END
+
+async def forward_followup(context: ContextTypes.DEFAULT_TYPE, update: Update, ticket: Ticket):
+    """Отправляет дополнение в чат поддержки ответом на исходное сообщение о заявке."""
+    support_chat_id = context.bot_data['support_chat_id']
+    user = update.message.from_user
+    header = (
+        f"Дополнение к {'предложению' if ticket.is_suggestion else 'заявке'} #{ticket.ticket_id}\n"
+        f"От пользователя: @{escape(user.username or '')} ({escape(user.first_name)})"
+    )
+    # Если исходное сообщение удалено или чат сменился, дополнение придёт отдельным сообщением
+    reply_parameters = (
+        ReplyParameters(ticket.support_message_id, allow_sending_without_reply=True)
+        if ticket.support_message_id else None
+    )
+    try:
+        if update.message.photo:
+            caption = header
+            if update.message.caption:
+                caption += f"\n\n{escape(update.message.caption[:800])}"
+            await context.bot.copy_message(
+                chat_id=support_chat_id,
+                from_chat_id=update.effective_chat.id,
+                message_id=update.message.message_id,
+                caption=caption,
+                parse_mode='HTML',
+                reply_parameters=reply_parameters
+            )
+        else:
+            await context.bot.send_message(
+                chat_id=support_chat_id,
+                text=f"{header}\n\n{escape(update.message.text[:3500])}",
+                parse_mode='HTML',
+                reply_parameters=reply_parameters
+            )
+    except ChatMigrated as e:
+        await migrate_support_chat(context, e.new_chat_id)
+    except Exception as e:
+        logger.error(f"Ошибка при пересылке дополнения в чат поддержки: {e}")
+
+async def cancel_followup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Отмена дополнения. Данные других диалогов пользователя не трогает."""
+    clear_user_data(update, context, FOLLOWUP_DATA_KEYS)
+    await update.message.reply_text("Дополнение отменено.", reply_markup=ReplyKeyboardRemove())
+    return ConversationHandler.END
+
+async def interrupt_followup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Завершает дополнение, когда пользователь отправил команду, и передаёт команду дальше.
+
+    Обработчик дополнения стоит перед остальными диалогами, поэтому команда возвращается
+    в очередь обновлений и обрабатывается повторно уже без активного дополнения.
+    """
+    clear_user_data(update, context, FOLLOWUP_DATA_KEYS)
+    context.bot_data['requeued_updates'].add(update.update_id)
+    await context.application.update_queue.put(update)
+    return ConversationHandler.END
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Отправляет метрики бота. Доступно только в чате поддержки."""
+    if not is_support_chat(update, context):
+        return
+    lines = [context.bot_data['faq_metrics'].as_text()]
+    lines.extend(request.as_text() for request in context.bot_data['bot_api_requests'])
+    lines.append(context.bot_data['flood_guard'].as_text())
+    lines.append(context.bot_data['user_data_budget'].as_text())
+    await update.message.reply_text("\n".join(lines))
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Отправляет сводку по обращениям из TicketDailyStat. Доступно только в чате поддержки."""
+    if not is_support_chat(update, context):
+        return
+    days = int(context.args[0]) if context.args and context.args[0].isdigit() else 7
+    summary = await database_sync_to_async(stats_summary, idempotent=True)(
+        max(days, 1), context.bot_data['tenant_id'] or 0
+    )
+    await update.message.reply_text(summary)
+
 async def handle_command_during_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обрабатывает команды во время активного диалога."""
     command = update.message.text.strip().lower()
@@ -514,30 +900,59 @@ async def handle_command_during_conversation(update: Update, context: ContextTyp
         return await suggestions_start(update, context)
     elif command == '/help':
         await update.message.reply_text(HELP_TEXT)
+        # Диалог завершается, таймаут уже не сработает, поэтому данные очищаются сразу
+        clear_user_data(update, context, DIALOG_DATA_KEYS)
         return ConversationHandler.END  # Завершаем текущий диалог
+    elif command == '/mytickets':
+        await mytickets_command(update, context)
+        clear_user_data(update, context, DIALOG_DATA_KEYS)
+        return ConversationHandler.END
     else:
         await update.message.reply_text(
             "Извините, я не понимаю эту команду. Пожалуйста, продолжайте или нажмите 'Отмена' для завершения.",
             reply_markup=ReplyKeyboardRemove()
         )
+        clear_user_data(update, context, DIALOG_DATA_KEYS)
         return ConversationHandler.END
 
 # Функция для установки команд бота
+async def set_bot_commands(bot: Bot):
+    try:
+        await bot.set_my_commands([
+            ('start', 'Начать обращение'),
+            ('suggestions', 'Предложить улучшения'),
+            ('mytickets', 'Мои обращения'),
+            ('help', 'Описание возможностей бота')
+        ])
+    except Exception as e:
+        logger.error(f"Ошибка при установке команд бота: {e}")
+
 async def post_init(application: Application):
-    await application.bot.set_my_commands([
-        ('start', 'Начать обращение'),
-        ('suggestions', 'Предложить улучшения'),
-        ('help', 'Описание возможностей бота')
-    ])
+    # Команды не нужны для обработки первого обновления, поэтому устанавливаются в фоне,
+    # не задерживая начало опроса
+    application.bot_data['set_commands_task'] = asyncio.create_task(set_bot_commands(application.bot))
 
-def main():
-    """Основная функция запуска приложения."""
+def build_application(tenant, request, get_updates_request, user_data_budget, faq_cache) -> Application:
+    """Собирает приложение одного бота. HTTP-клиенты и лимит памяти диалогов общие для всех ботов."""
     application = (
         ApplicationBuilder()
-        .token(settings.TELEGRAM_BOT_TOKEN)
-        .post_init(post_init)
+        .token(tenant.token)
+        .request(request)
+        .get_updates_request(get_updates_request)
         .build()
     )
+    application.bot_data['tenant_id'] = tenant.id
+    application.bot_data['support_chat_id'] = tenant.support_chat_id
+    application.bot_data['bot_api_requests'] = (request, get_updates_request)
+
+    # Индекс FAQ строится один раз при запуске и общий для ботов с одинаковыми статьями
+    application.bot_data['faq_index'], application.bot_data['faq_text'] = faq_cache.get(tenant.faq_entries)
+    application.bot_data['faq_metrics'] = FaqMetrics()
+    application.bot_data['catalog_cache'] = CatalogCache(settings.CATALOG_RELOAD_INTERVAL, tenant.id)
+    # Лимиты частоты Telegram действуют на каждого бота отдельно
+    application.bot_data['flood_guard'] = FloodGuard(**settings.FLOOD_GUARD)
+    application.bot_data['requeued_updates'] = set()
+    application.bot_data['user_data_budget'] = user_data_budget
 
     # Обработчики диалогов
     conv_handler = ConversationHandler(
@@ -551,6 +966,10 @@ def main():
                 MessageHandler(filters.TEXT & ~filters.COMMAND, ask_description),
                 MessageHandler(filters.COMMAND, handle_command_during_conversation),
             ],
+            ASK_FAQ_FEEDBACK: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_faq_feedback),
+                MessageHandler(filters.COMMAND, handle_command_during_conversation),
+            ],
             ASK_SCREENSHOT: [
                 MessageHandler(filters.PHOTO, ask_screenshot),  # Обработка только фото
                 MessageHandler(filters.TEXT & ~filters.COMMAND, ask_screenshot),  # Обработка текста "Нет"
@@ -560,6 +979,9 @@ def main():
                 MessageHandler(filters.TEXT & ~filters.COMMAND, ask_additional_info),
                 MessageHandler(filters.COMMAND, handle_command_during_conversation),
             ],
+            ConversationHandler.TIMEOUT: [
+                TypeHandler(Update, functools.partial(conversation_timeout, keys=TICKET_DATA_KEYS))
+            ],
         },
         fallbacks=[
             CommandHandler('cancel', cancel),
@@ -568,6 +990,7 @@ def main():
             MessageHandler(filters.Regex('^Отмена$'), cancel),
             MessageHandler(filters.COMMAND, handle_command_during_conversation),
         ],
+        conversation_timeout=settings.CONVERSATION_TIMEOUT,
     )
 
     suggestions_handler = ConversationHandler(
@@ -585,6 +1008,9 @@ def main():
                 MessageHandler(filters.TEXT & ~filters.COMMAND, suggestion_text_received),
                 MessageHandler(filters.COMMAND, handle_command_during_conversation),
             ],
+            ConversationHandler.TIMEOUT: [
+                TypeHandler(Update, functools.partial(conversation_timeout, keys=SUGGESTION_DATA_KEYS))
+            ],
         },
         fallbacks=[
             CommandHandler('cancel', cancel_suggestion),
@@ -593,16 +1019,98 @@ def main():
             MessageHandler(filters.Regex('^Отмена$'), cancel_suggestion),
             MessageHandler(filters.COMMAND, handle_command_during_conversation),
         ],
+        conversation_timeout=settings.CONVERSATION_TIMEOUT,
     )
 
-    # Добавление обработчиков
+    # Диалог начинается с inline-кнопки, дальше отслеживается по пользователю, а не по сообщению,
+    # поэтому предупреждение PTB о per_message=False здесь не относится к делу
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message="If 'per_message=False'", category=PTBUserWarning)
+        followup_handler = ConversationHandler(
+            entry_points=[CallbackQueryHandler(followup_start, pattern=r'^followup:\d+$')],
+            states={
+                FOLLOWUP_MESSAGE: [
+                    MessageHandler(filters.Regex('^Отмена$'), cancel_followup),
+                    MessageHandler((filters.TEXT & ~filters.COMMAND) | filters.PHOTO, receive_followup),
+                ],
+                ConversationHandler.TIMEOUT: [
+                    TypeHandler(Update, functools.partial(conversation_timeout, keys=FOLLOWUP_DATA_KEYS))
+                ],
+            },
+            # Любая команда (/start, /suggestions, /mytickets...) завершает дополнение
+            fallbacks=[MessageHandler(filters.COMMAND, interrupt_followup)],
+            conversation_timeout=settings.CONVERSATION_TIMEOUT,
+        )
+
+    # Флуд-контроль в группе с высшим приоритетом, до любых обработчиков
+    application.add_handler(TypeHandler(Update, flood_guard), group=-1)
+
+    # Добавление обработчиков. Дополнение первым: пока оно активно, текст и фото относятся к нему
+    application.add_handler(followup_handler)
     application.add_handler(conv_handler)
     application.add_handler(suggestions_handler)
+    application.add_handler(CommandHandler("mytickets", mytickets_command))
+    application.add_handler(CallbackQueryHandler(mytickets_page, pattern=r'^mytickets:'))
+    application.add_handler(CallbackQueryHandler(ticket_details, pattern=r'^ticket:\d+$'))
     application.add_handler(MessageHandler(filters.PHOTO, handle_unexpected_photo))  # Новый обработчик
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("metrics", metrics_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+
+    return application
+
+def build_applications(tenants):
+    """Собирает приложения всех ботов с общими HTTP-клиентами, индексами FAQ и лимитом памяти."""
+    # Один настроенный HTTP-клиент на все вызовы Bot API (включая скачивание файлов)
+    # и отдельный — для долгого опроса getUpdates
+    request, get_updates_request = build_requests(len(tenants))
+    user_data_budget = UserDataBudget(settings.USER_DATA_MAX_BYTES, settings.USER_DATA_TOTAL_MAX_BYTES)
+    faq_cache = FaqCache()
+    return [
+        build_application(tenant, request, get_updates_request, user_data_budget, faq_cache)
+        for tenant in tenants
+    ]
+
+async def run_applications(applications):
+    """Запускает все боты в одном цикле событий и останавливает их по SIGINT/SIGTERM.
 
-    # Запуск бота
-    application.run_polling()
+    Запросы к базе всех ботов идут через общий поток database_sync_to_async.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    started = []
+    try:
+        for application in applications:
+            try:
+                await application.initialize()
+            except InvalidToken:
+                # Ошибка в токене одного бота не должна останавливать остальных
+                logger.error("Бот %s не запущен: неверный токен", application.bot_data['tenant_id'])
+                continue
+            started.append(application)
+            await post_init(application)
+            await application.updater.start_polling()
+            await application.start()
+        if started:
+            logger.info("Запущено ботов: %d", len(started))
+            await stop.wait()
+    finally:
+        for application in reversed(started):
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+        # HTTP-клиенты общие, поэтому закрываются только после остановки всех ботов
+        for application in started:
+            await application.shutdown()
+
+def main():
+    """Основная функция запуска приложения."""
+    applications = build_applications(load_tenants())
+    asyncio.run(run_applications(applications))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,50 @@
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from tg_app.faq import FAQ_ENTRIES, FaqEntry, FaqIndex, render_faq_text
+from tg_app.models import BotTenant
+
+
+class TenantConfig(NamedTuple):
+    id: Optional[int]
+    name: str
+    token: str
+    support_chat_id: str
+    faq_entries: tuple
+
+
+def load_tenants():
+    """Настройки активных ботов из BotTenant.
+
+    Пока в базе нет ни одного бота, работает один бот из TELEGRAM_BOT_TOKEN и SUPPORT_CHAT_ID.
+    Бот без своих статей FAQ использует встроенный FAQ.
+    """
+    tenants = BotTenant.objects.filter(is_active=True).order_by('pk').prefetch_related('faq_articles')
+    configs = [
+        TenantConfig(
+            tenant.pk, tenant.name, tenant.token, tenant.support_chat_id,
+            tuple(FaqEntry(article.question, article.answer) for article in tenant.faq_articles.all())
+            or tuple(FAQ_ENTRIES),
+        )
+        for tenant in tenants
+    ]
+    return configs or [
+        TenantConfig(None, 'default', settings.TELEGRAM_BOT_TOKEN, settings.SUPPORT_CHAT_ID, tuple(FAQ_ENTRIES))
+    ]
+
+
+class FaqCache:
+    """Индексы и тексты FAQ, общие для ботов с одинаковым набором статей."""
+
+    def __init__(self):
+        self._by_entries = {}
+
+    def __len__(self):
+        return len(self._by_entries)
+
+    def get(self, entries):
+        """Пара (FaqIndex, текст FAQ) для набора статей `entries`."""
+        if entries not in self._by_entries:
+            self._by_entries[entries] = (FaqIndex(entries), render_faq_text(entries))
+        return self._by_entries[entries]
@@ -1,3 +1,469 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import Permission, User
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from telegram import CallbackQuery, Chat, Message, Update, User as TelegramUser
+from telegram.ext import ApplicationHandlerStop, CallbackContext, ConversationHandler
+
+from . import archive
+from .archive import archive_batch, find_archived_ticket, restore_ticket
+from .db import database_sync_to_async
+from .faq import FAQ_ENTRIES, FaqEntry, FaqIndex, tokenize
+from .history import ticket_page
+from .models import BotTenant, Ticket, UserProfile
+from .stats import rebuild_ticket_stats, recompute_ticket_stats, stats_watermark, stored_ticket_stats
+from .telegram_bot import (
+    FOLLOWUP_DATA_KEYS, SUGGESTION_PAGE, SUGGESTION_SECTION, TICKET_DATA_KEYS, build_applications, flood_guard,
+    handle_command_during_conversation, interrupt_followup, release_conversation, suggestion_section_selected,
+    track_user_data,
+)
+from .tenants import FaqCache, TenantConfig
+from .throttle import FloodGuard
+
+
+class TicketDailyStatTests(TestCase):
+    """Инкрементальные счётчики TicketDailyStat совпадают с полным пересчётом по заявкам."""
+
+    def setUp(self):
+        self.user = UserProfile.objects.create(telegram_id=1, username='user')
+
+    def assertStatsMatch(self):
+        self.assertEqual(stored_ticket_stats(), recompute_ticket_stats())
+
+    def create_ticket(self, **kwargs):
+        fields = {'user': self.user, 'description': 'Не сохраняется бюджет', 'page': 'Бюджет'}
+        fields.update(kwargs)
+        return Ticket.objects.create(**fields)
+
+    def test_create(self):
+        self.create_ticket()
+        self.create_ticket(page='Долги', section='Кредиты', is_suggestion=True)
+        self.create_ticket(created_at=timezone.now() - timedelta(days=3))
+        self.assertStatsMatch()
+        self.assertEqual(sum(count for count, _ in stored_ticket_stats().values()), 3)
+
+    def test_status_changes_with_reopen(self):
+        ticket = self.create_ticket(created_at=timezone.now() - timedelta(hours=5))
+        for status in ('in_progress', 'resolved', 'closed', 'new', 'in_progress', 'resolved'):
+            ticket.status = status
+            ticket.save()
+            self.assertStatsMatch()
+
+        ticket.status = 'new'
+        ticket.save()
+        self.assertIsNone(ticket.resolved_at)
+        self.assertTrue(all(resolution == 0 for _, resolution in stored_ticket_stats().values()))
+        self.assertStatsMatch()
+
+    def test_page_and_section_edits(self):
+        ticket = self.create_ticket(section='Расходы')
+        ticket.page = 'Инвестиции'
+        ticket.section = 'Депозит'
+        ticket.save()
+        self.assertStatsMatch()
+
+        ticket.section = None
+        ticket.save()
+        self.assertStatsMatch()
+
+    def test_admin_save(self):
+        ticket = self.create_ticket()
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        ticket.status = 'resolved'
+        ticket.page = 'Профиль'
+        admin.site._registry[Ticket].save_model(None, ticket, None, True)
+        self.assertStatsMatch()
+
+    def test_save_update_fields(self):
+        ticket = self.create_ticket()
+        ticket.status = 'closed'
+        ticket.save(update_fields=['status'])
+        self.assertIsNotNone(Ticket.objects.get(pk=ticket.pk).resolved_at)
+        self.assertStatsMatch()
+
+    def test_save_deferred_instance(self):
+        ticket = self.create_ticket()
+        ticket = Ticket.objects.only('status').get(pk=ticket.pk)
+        ticket.status = 'in_progress'
+        ticket.save()
+        self.assertStatsMatch()
+
+    def test_restore_is_not_counted_twice(self):
+        ticket = self.create_ticket(status='closed', created_at=timezone.now() - timedelta(days=400))
+        stats_before = stored_ticket_stats()
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            self.assertEqual(archive_batch(Ticket.objects.filter(pk=ticket.pk), archive_dir, 10), 1)
+            # Архивация не вычитает заявку из статистики
+            self.assertEqual(stored_ticket_stats(), stats_before)
+
+            restore_ticket(find_archived_ticket(archive_dir, ticket.ticket_id), archive_dir)
+        self.assertEqual(stored_ticket_stats(), stats_before)
+        self.assertStatsMatch()
+
+    def test_rebuild_keeps_archived_days(self):
+        archived = self.create_ticket(status='closed', created_at=timezone.now() - timedelta(days=400))
+        self.create_ticket()
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archive_batch(Ticket.objects.filter(pk=archived.pk), archive_dir, 10)
+
+        since = stats_watermark()
+        self.assertEqual(stored_ticket_stats(since), recompute_ticket_stats(since))
+        stats_before = stored_ticket_stats()
+        rebuild_ticket_stats(since)
+        self.assertEqual(stored_ticket_stats(), stats_before)
+
+
+class TicketHistoryTests(TestCase):
+    def test_pages_cover_tenant_tickets_once(self):
+        user = UserProfile.objects.create(telegram_id=1, username='user')
+        tenant = BotTenant.objects.create(name='first', token=f'1:{"A" * 35}', support_chat_id='-1')
+        now = timezone.now()
+        # По три заявки с одинаковой датой создания: порядок внутри них задаёт id
+        tickets = [
+            Ticket.objects.create(user=user, tenant=tenant, description='Ошибка', created_at=now - timedelta(days=day))
+            for day in range(4) for _ in range(3)
+        ]
+        Ticket.objects.create(user=user, description='Ошибка в другом боте', created_at=now)
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = ticket_page(user.telegram_id, tenant.pk, cursor, page_size=5)
+            seen.extend(row['id'] for row in rows)
+            if cursor is None:
+                break
+        tickets.sort(key=lambda ticket: (ticket.created_at, ticket.pk), reverse=True)
+        self.assertEqual(seen, [ticket.pk for ticket in tickets])
+
+
+class ExportPermissionTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def grant(self, *codenames):
+        self.staff.user_permissions.add(*Permission.objects.filter(codename__in=codenames))
+
+    def test_staff_without_view_permission_is_forbidden(self):
+        self.assertEqual(self.client.get('/api/export/tickets/').status_code, 403)
+        self.assertEqual(self.client.get('/api/export/users/').status_code, 403)
+
+    def test_tickets_require_ticket_and_user_permissions(self):
+        self.grant('view_ticket')
+        self.assertEqual(self.client.get('/api/export/tickets/').status_code, 403)
+        self.grant('view_userprofile')
+        self.assertEqual(self.client.get('/api/export/tickets/').status_code, 200)
+
+    def test_users_require_user_permission(self):
+        self.grant('view_userprofile')
+        self.assertEqual(self.client.get('/api/export/users/').status_code, 200)
+        self.assertEqual(self.client.get('/api/export/tickets/').status_code, 403)
+
+    def test_invalid_dates(self):
+        self.grant('view_userprofile')
+        for value in ('2024-13-45', '2024-02-30', '01.02.2024'):
+            with self.subTest(value=value):
+                self.assertEqual(self.client.get('/api/export/users/', {'date_from': value}).status_code, 400)
+        self.assertEqual(self.client.get('/api/export/users/', {'date_from': '2024-02-29'}).status_code, 200)
+
+    def test_admin_ticket_export_requires_user_permission(self):
+        def admin_actions():
+            request = RequestFactory().get('/admin/tg_app/ticket/')
+            # Права кэшируются в объекте пользователя, поэтому он перечитывается из базы
+            request.user = User.objects.get(pk=self.staff.pk)
+            return admin.site._registry[Ticket].get_actions(request)
+
+        self.grant('view_ticket')
+        self.assertNotIn('export_csv', admin_actions())
+        self.grant('view_userprofile')
+        self.assertIn('export_csv', admin_actions())
+        self.assertIn('export_jsonl', admin_actions())
+
+    def test_unknown_dataset(self):
+        self.assertEqual(self.client.get('/api/export/attachments/').status_code, 404)
+
+
+class TenantResourcesTests(TestCase):
+    """Боты одного процесса делят HTTP-клиенты, индексы FAQ и лимит памяти диалогов."""
+
+    def setUp(self):
+        custom_faq = (FaqEntry("Как сбросить пароль?", "Нажмите «Забыли пароль» на экране входа."),)
+        self.tenants = [
+            TenantConfig(1, 'first', f'1:{"A" * 35}', '-1', tuple(FAQ_ENTRIES)),
+            TenantConfig(2, 'second', f'2:{"B" * 35}', '-2', tuple(FAQ_ENTRIES)),
+            TenantConfig(3, 'third', f'3:{"C" * 35}', '-3', custom_faq),
+        ]
+
+    def test_build_applications_shares_resources(self):
+        first, second, third = build_applications(self.tenants)
+        request, get_updates_request = first.bot_data['bot_api_requests']
+        for application in (second, third):
+            self.assertIs(application.bot.request, request)
+            self.assertIs(application.bot_data['bot_api_requests'][1], get_updates_request)
+            self.assertIs(application.bot_data['user_data_budget'], first.bot_data['user_data_budget'])
+            self.assertIsNot(application.bot_data['flood_guard'], first.bot_data['flood_guard'])
+            self.assertIsNot(application.bot_data['catalog_cache'], first.bot_data['catalog_cache'])
+        # Каждый бот держит свой долгий опрос getUpdates
+        self.assertGreaterEqual(get_updates_request.pool_size, len(self.tenants))
+
+        self.assertIs(second.bot_data['faq_index'], first.bot_data['faq_index'])
+        self.assertIsNot(third.bot_data['faq_index'], first.bot_data['faq_index'])
+        self.assertEqual([app.bot_data['support_chat_id'] for app in (first, second, third)], ['-1', '-2', '-3'])
+
+    def test_faq_cache(self):
+        cache = FaqCache()
+        index, text = cache.get(self.tenants[0].faq_entries)
+        self.assertIs(cache.get(self.tenants[1].faq_entries)[0], index)
+        self.assertIn(FAQ_ENTRIES[0].question, text)
+        cache.get(self.tenants[2].faq_entries)
+        self.assertEqual(len(cache), 2)
+
+
+class ConversationDataTests(TestCase):
+    """Завершение одного диалога не затрагивает данные других диалогов пользователя."""
+
+    def setUp(self):
+        tenant = TenantConfig(1, 'first', f'1:{"A" * 35}', '-1', tuple(FAQ_ENTRIES))
+        self.application = build_applications([tenant])[0]
+        user = TelegramUser(7, 'user', False)
+        message = Message(1, datetime.now(dt_timezone.utc), Chat(7, Chat.PRIVATE), from_user=user, text='/mytickets')
+        self.update = Update(1, message=message)
+        self.context = CallbackContext.from_update(self.update, self.application)
+        self.context.user_data.update({'selected_page': 'Бюджет', 'description': 'Не сохраняется бюджет'})
+        self.context.user_data['followup_ticket_id'] = 5
+        track_user_data(self.update, self.context)
+
+    def test_timeout_keeps_other_conversation(self):
+        release_conversation(self.update, self.context, FOLLOWUP_DATA_KEYS)
+        self.assertEqual(self.context.user_data, {'selected_page': 'Бюджет', 'description': 'Не сохраняется бюджет'})
+        self.assertIn(7, self.application.user_data)
+
+        release_conversation(self.update, self.context, TICKET_DATA_KEYS)
+        self.assertNotIn(7, self.application.user_data)
+        self.assertEqual(len(self.application.bot_data['user_data_budget']), 0)
+
+    async def test_command_interrupts_followup(self):
+        state = await interrupt_followup(self.update, self.context)
+        self.assertEqual(state, ConversationHandler.END)
+        self.assertNotIn('followup_ticket_id', self.context.user_data)
+        self.assertIn('description', self.context.user_data)
+        # Команда повторно обрабатывается остальными обработчиками
+        self.assertIs(self.application.update_queue.get_nowait(), self.update)
+        self.assertIn(self.update.update_id, self.application.bot_data['requeued_updates'])
+
+    async def test_mytickets_ends_dialog(self):
+        with mock.patch.object(Message, 'reply_text', mock.AsyncMock()) as reply_text:
+            state = await handle_command_during_conversation(self.update, self.context)
+        self.assertEqual(state, ConversationHandler.END)
+        reply_text.assert_awaited_once()
+        self.assertIn('/start', reply_text.await_args.args[0])
+        self.assertEqual(self.context.user_data, {'followup_ticket_id': 5})
+
+
+class FaqIndexTests(TestCase):
+    """Автоответ из FAQ предлагается только при совпадении не слабее FAQ_MATCH_MIN_SCORE."""
+
+    def setUp(self):
+        self.index = FaqIndex(FAQ_ENTRIES)
+
+    def test_tokenize_drops_stop_words(self):
+        self.assertEqual(tokenize('Приложение вылетает при запуске'), ['вылетает', 'запуск'])
+        self.assertEqual(tokenize('Ошибка в приложении Investudy'), ['ошибк'])
+        # Разные формы слова сводятся к одной основе
+        self.assertEqual(tokenize('долги'), tokenize('долгов'))
+
+    def test_matching_descriptions(self):
+        for text, question in (
+            ('Как отслеживать долги?', FAQ_ENTRIES[1].question),
+            ('Не могу добавить инвестиции', FAQ_ENTRIES[3].question),
+            ('Как завести бюджет', FAQ_ENTRIES[0].question),
+        ):
+            with self.subTest(text=text):
+                entry = self.index.best_match(text, settings.FAQ_MATCH_MIN_SCORE)
+                self.assertIsNotNone(entry)
+                self.assertEqual(entry.question, question)
+
+    def test_generic_descriptions_are_not_matched(self):
+        for text in ('Приложение вылетает при запуске', 'Проблема с приложением', 'Не работает приложение'):
+            with self.subTest(text=text):
+                self.assertIsNone(self.index.best_match(text, settings.FAQ_MATCH_MIN_SCORE))
+
+    def test_threshold_is_inclusive(self):
+        score, entry = self.index.search('Как отслеживать долги?')[0]
+        self.assertIs(self.index.best_match('Как отслеживать долги?', score), entry)
+        self.assertIsNone(self.index.best_match('Как отслеживать долги?', score + 0.01))
+
+
+class SuggestionDialogTests(TestCase):
+    """Выбор вкладки, когда выбранной ранее страницы уже нет в каталоге."""
+
+    def setUp(self):
+        tenant = TenantConfig(1, 'first', f'1:{"A" * 35}', '-1', tuple(FAQ_ENTRIES))
+        self.application = build_applications([tenant])[0]
+        user = TelegramUser(7, 'user', False)
+        message = Message(1, datetime.now(dt_timezone.utc), Chat(7, Chat.PRIVATE), from_user=user, text='Расходы')
+        self.update = Update(1, message=message)
+        self.context = CallbackContext.from_update(self.update, self.application)
+
+    async def select_section(self):
+        with mock.patch.object(Message, 'reply_text', mock.AsyncMock()) as reply_text:
+            state = await suggestion_section_selected(self.update, self.context)
+        return state, reply_text.await_args
+
+    async def test_known_page(self):
+        self.context.user_data['selected_page'] = 'Бюджет'
+        state, _ = await self.select_section()
+        self.assertNotIn(state, (SUGGESTION_PAGE, SUGGESTION_SECTION))
+        self.assertEqual(self.context.user_data['selected_section'], 'Расходы')
+
+    async def test_removed_page_returns_to_page_choice(self):
+        catalog = await self.application.bot_data['catalog_cache'].get()
+        for selected_page in ('Удалённая страница', None):
+            with self.subTest(selected_page=selected_page):
+                self.context.user_data['selected_page'] = selected_page
+                state, reply = await self.select_section()
+                self.assertEqual(state, SUGGESTION_PAGE)
+                self.assertIs(reply.kwargs['reply_markup'], catalog.pages_keyboard)
+                self.assertNotIn('selected_page', self.context.user_data)
+
+
+class DatabaseRetryTests(TestCase):
+    """После разрыва соединения повторяются только вызовы, которые безопасно выполнить дважды."""
+
+    def setUp(self):
+        # Соединение закрыто после ошибки, транзакции нет
+        connection = mock.Mock(in_atomic_block=False, connection=None, errors_occurred=True)
+        for patcher in (mock.patch('tg_app.db.connection', connection), mock.patch('tg_app.db.close_old_connections')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.func = mock.Mock(side_effect=[OperationalError('server closed the connection'), 'ok'])
+
+    async def test_idempotent_call_is_retried(self):
+        self.assertEqual(await database_sync_to_async(self.func, idempotent=True)(), 'ok')
+        self.assertEqual(self.func.call_count, 2)
+
+    async def test_write_is_not_retried(self):
+        with self.assertRaises(OperationalError):
+            await database_sync_to_async(self.func)()
+        self.assertEqual(self.func.call_count, 1)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create(telegram_id=1, username='user')
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        self.old = timezone.now() - timedelta(days=400)
+
+    def create_ticket(self, **kwargs):
+        ticket = Ticket.objects.create(user=self.user, description='Ошибка', status='closed', **kwargs)
+        Ticket.objects.filter(pk=ticket.pk).update(updated_at=self.old)
+        return ticket
+
+    def archivable(self):
+        return Ticket.objects.filter(status__in=['closed'], updated_at__lt=timezone.now() - timedelta(days=30))
+
+    def test_ticket_reopened_during_archiving_is_kept(self):
+        reopened, archived = self.create_ticket(), self.create_ticket()
+        serialize_ticket = archive.serialize_ticket
+
+        def reopen_while_writing(ticket, archive_dir):
+            if ticket.pk == reopened.pk:
+                Ticket.objects.filter(pk=ticket.pk).update(status='new', updated_at=timezone.now())
+            return serialize_ticket(ticket, archive_dir)
+
+        with mock.patch.object(archive, 'serialize_ticket', reopen_while_writing):
+            self.assertEqual(archive_batch(self.archivable(), self.archive_dir, 10), 1)
+        self.assertEqual(list(Ticket.objects.values_list('pk', flat=True)), [reopened.pk])
+        self.assertIsNotNone(find_archived_ticket(self.archive_dir, archived.ticket_id))
+
+    def test_restore_into_deleted_tenant(self):
+        tenant = BotTenant.objects.create(name='first', token=f'1:{"A" * 35}', support_chat_id='-1')
+        other = BotTenant.objects.create(name='second', token=f'2:{"B" * 35}', support_chat_id='-2')
+        ticket = self.create_ticket(tenant=tenant)
+        archive_batch(self.archivable(), self.archive_dir, 10)
+        tenant.delete()
+
+        with self.assertRaisesMessage(CommandError, '--tenant'):
+            call_command('restore_ticket', ticket.ticket_id, archive_dir=self.archive_dir)
+        self.assertFalse(Ticket.objects.exists())
+
+        call_command(
+            'restore_ticket', ticket.ticket_id, archive_dir=self.archive_dir, tenant='second', stdout=io.StringIO()
+        )
+        self.assertEqual(Ticket.objects.get().tenant, other)
+
+
+class FloodGuardTests(TestCase):
+    def setUp(self):
+        self.now = time.monotonic()
+        self.guard = FloodGuard(user_rate=1, user_burst=3, global_rate=100, global_burst=100, idle_ttl=60)
+
+    def allow(self, user_id, after=0.0):
+        return self.guard.allow(user_id, now=self.now + after)
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.allow(1) for _ in range(3)], [(True, False)] * 3)
+        self.assertEqual(self.allow(1), (False, True))
+        self.assertEqual(self.allow(1), (False, False))
+        # Другой пользователь ограничен отдельно
+        self.assertEqual(self.allow(2), (True, False))
+        # За секунду при user_rate=1 накапливается один токен
+        self.assertEqual(self.allow(1, after=1), (True, False))
+        self.assertEqual(self.allow(1, after=1), (False, True))
+
+    def test_first_rejection_counters(self):
+        for _ in range(5):
+            self.allow(1)
+        self.assertEqual(self.guard.throttled_updates, 2)
+        self.assertEqual((self.guard.throttled_users_now, self.guard.throttled_users_total), (1, 1))
+        self.allow(1, after=2)
+        self.assertEqual((self.guard.throttled_users_now, self.guard.throttled_users_total), (0, 1))
+
+    def test_global_budget_refunds_user_token(self):
+        guard = FloodGuard(user_rate=0.1, user_burst=1, global_rate=1, global_burst=1, idle_ttl=60)
+        self.assertEqual(guard.allow(1, now=self.now), (True, False))
+        self.assertEqual(guard.allow(2, now=self.now), (False, False))
+        self.assertEqual(guard.throttled_global, 1)
+        # Отказ по общему лимиту не расходует токен пользователя: без возврата за секунду
+        # при user_rate=0.1 токен не успел бы накопиться
+        self.assertEqual(guard.allow(2, now=self.now + 1), (True, False))
+
+    def test_idle_buckets_are_evicted(self):
+        for user_id in range(3):
+            self.allow(user_id)
+        for _ in range(3):
+            self.allow(0)
+        self.assertEqual(len(self.guard), 3)
+        self.assertEqual(self.guard.throttled_users_now, 1)
+        self.allow(1, after=30)
+        self.allow(5, after=61)
+        # Остались бакеты, к которым обращались меньше idle_ttl назад
+        self.assertEqual(len(self.guard), 2)
+        self.assertEqual(self.guard.throttled_users_now, 0)
+
+    async def test_throttled_callback_query_is_answered(self):
+        tenant = TenantConfig(1, 'first', f'1:{"A" * 35}', '-1', tuple(FAQ_ENTRIES))
+        application = build_applications([tenant])[0]
+        application.bot_data['flood_guard'] = self.guard
+        user = TelegramUser(7, 'user', False)
+        update = Update(1, callback_query=CallbackQuery('1', user, 'chat', data='mytickets:'))
+        context = CallbackContext.from_update(update, application)
+
+        with mock.patch.object(CallbackQuery, 'answer', mock.AsyncMock()) as answer:
+            for _ in range(3):
+                await flood_guard(update, context)
+            for _ in range(2):
+                with self.assertRaises(ApplicationHandlerStop):
+                    await flood_guard(update, context)
+        answer.assert_awaited_once()
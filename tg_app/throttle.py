@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated_at', 'throttled')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated_at = now
+        self.throttled = False
+
+    def consume(self, now, rate, burst):
+        """Пополняет бакет за прошедшее время и списывает один токен, если он есть."""
+        self.tokens = min(burst, self.tokens + max(now - self.updated_at, 0) * rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class FloodGuard:
+    """Ограничение частоты обновлений: бакет на каждого пользователя и общий бюджет бота.
+
+    Бакеты хранятся в OrderedDict в порядке последнего обращения, поэтому и проверка,
+    и вытеснение простаивающих бакетов с начала словаря стоят O(1) на обновление.
+    """
+
+    def __init__(self, user_rate, user_burst, global_rate, global_burst, idle_ttl):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.idle_ttl = idle_ttl
+        self._buckets = OrderedDict()
+        self._global = TokenBucket(global_burst, time.monotonic())
+
+        self.throttled_updates = 0
+        self.throttled_global = 0
+        self.throttled_users_total = 0
+        self.throttled_users_now = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, user_id, now=None):
+        """Возвращает (разрешено, первый отказ подряд для этого пользователя)."""
+        now = time.monotonic() if now is None else now
+        self._evict_idle(now)
+
+        bucket = None
+        if user_id is not None:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.user_burst, now)
+            else:
+                self._buckets.move_to_end(user_id)
+
+            if not bucket.consume(now, self.user_rate, self.user_burst):
+                self.throttled_updates += 1
+                first = not bucket.throttled
+                if first:
+                    bucket.throttled = True
+                    self.throttled_users_total += 1
+                    self.throttled_users_now += 1
+                return False, first
+
+        if not self._global.consume(now, self.global_rate, self.global_burst):
+            if bucket is not None:
+                bucket.tokens += 1  # пользователь не виноват в исчерпании общего бюджета
+            self.throttled_updates += 1
+            self.throttled_global += 1
+            return False, False
+
+        if bucket is not None and bucket.throttled:
+            bucket.throttled = False
+            self.throttled_users_now -= 1
+        return True, False
+
+    def _evict_idle(self, now):
+        while self._buckets:
+            user_id, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated_at < self.idle_ttl:
+                break
+            del self._buckets[user_id]
+            if bucket.throttled:
+                self.throttled_users_now -= 1
+
+    def as_text(self):
+        return (
+            f"Флуд-контроль: отброшено обновлений {self.throttled_updates} "
+            f"(по общему лимиту {self.throttled_global}), ограничено сейчас {self.throttled_users_now}, "
+            f"всего ограничивалось {self.throttled_users_total}, бакетов в памяти {len(self)}"
+        )
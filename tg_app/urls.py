@@ -0,0 +1,7 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('export/<str:dataset>/', views.export_view, name='export'),
+]
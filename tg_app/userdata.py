@@ -0,0 +1,76 @@
+import resource
+from collections import OrderedDict
+
+
+def payload_size(user_data):
+    """Приблизительный объём данных диалога: байты строк и двоичных данных в user_data."""
+    size = 0
+    for value in user_data.values():
+        if isinstance(value, dict):
+            size += payload_size(value)
+        elif isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value)
+    return size
+
+
+def current_rss_bytes():
+    """Текущий RSS процесса; вне Linux — пиковый RSS."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class UserDataBudget:
+    """Учёт байт, которые незавершённые диалоги держат в context.user_data.
+
+    Пользователи хранятся в порядке последнего изменения данных. Когда общий объём
+    превышает `total_limit`, данные самых старых диалогов вытесняются.
+    """
+
+    def __init__(self, per_user_limit, total_limit):
+        self.per_user_limit = per_user_limit
+        self.total_limit = total_limit
+        self._usage = OrderedDict()
+        self.total = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self._usage)
+
+    def fits(self, size):
+        """Поместятся ли данные объёмом `size` в лимит на одного пользователя."""
+        if size > self.per_user_limit:
+            self.rejected += 1
+            return False
+        return True
+
+    def update(self, user_id, size):
+        """Запоминает объём данных пользователя. Возвращает id пользователей, чьи данные нужно вытеснить."""
+        self.release(user_id)
+        if not size:
+            return []
+        self._usage[user_id] = size
+        self.total += size
+
+        evicted = []
+        while self.total > self.total_limit and len(self._usage) > 1:
+            oldest_id, oldest_size = self._usage.popitem(last=False)
+            self.total -= oldest_size
+            self.evicted += 1
+            evicted.append(oldest_id)
+        return evicted
+
+    def release(self, user_id):
+        self.total -= self._usage.pop(user_id, 0)
+
+    def as_text(self):
+        return (
+            f"Память диалогов: {self.total / 1024 / 1024:.1f} МБ у {len(self)} пользователей "
+            f"(лимит {self.total_limit / 1024 / 1024:.0f} МБ), вытеснено {self.evicted}, "
+            f"отклонено по размеру {self.rejected}, RSS {current_rss_bytes() / 1024 / 1024:.0f} МБ"
+        )
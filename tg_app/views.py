@@ -1,3 +1,64 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_GET
+
+from .export import EXPORT_FORMATS, export_response, filter_tickets, filter_users, ticket_rows, user_rows
+from .models import Ticket, UserProfile
+
+
+# Выгрузка заявок содержит и данные пользователей, поэтому для неё нужны оба права
+EXPORT_PERMISSIONS = {
+    'tickets': ('tg_app.view_ticket', 'tg_app.view_userprofile'),
+    'users': ('tg_app.view_userprofile',),
+}
+
+
+def is_export_allowed(request, dataset):
+    """Выгрузка доступна сотрудникам с правом просмотра набора данных или по токену EXPORT_API_TOKEN."""
+    user = request.user
+    if user.is_authenticated and user.is_staff and user.has_perms(EXPORT_PERMISSIONS[dataset]):
+        return True
+    token = settings.EXPORT_API_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+
+
+@require_GET
+def export_view(request, dataset):
+    """Потоковая выгрузка заявок или пользователей для BI-инструментов.
+
+    Параметры: format (csv, jsonl, parquet), date_from, date_to (YYYY-MM-DD),
+    для заявок также page, type (ticket, suggestion), tenant (имя бота) и attachments=1.
+    """
+    if dataset not in EXPORT_PERMISSIONS:
+        raise Http404(f'Неизвестный набор данных: {dataset}')
+    if not is_export_allowed(request, dataset):
+        return HttpResponseForbidden()
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'Неизвестный формат: {export_format}')
+
+    dates = {}
+    for name in ('date_from', 'date_to'):
+        value = request.GET.get(name)
+        try:
+            # parse_date возвращает None для неверного формата и бросает ValueError для несуществующей даты
+            dates[name] = parse_date(value) if value else None
+        except ValueError:
+            dates[name] = None
+        if value and dates[name] is None:
+            return HttpResponseBadRequest(f'Неверная дата {name}: {value}')
+
+    if dataset == 'tickets':
+        queryset = filter_tickets(
+            Ticket.objects.all(), page=request.GET.get('page'), ticket_type=request.GET.get('type'),
+            tenant=request.GET.get('tenant'), **dates
+        )
+        header, rows = ticket_rows(queryset, include_attachments=request.GET.get('attachments') == '1')
+    else:
+        header, rows = user_rows(filter_users(UserProfile.objects.all(), **dates))
+    return export_response(export_format, header, rows, dataset)